@@ -0,0 +1,337 @@
+"""Benchmark planning and creating synthetic blueprints against the local mock Jira.
+
+Each scenario and creation mode runs in a fresh interpreter, so peak memory is measured per run.
+Results can be saved with --output and compared to an earlier run with --baseline.
+
+Usage: python benchmarks/bench_blueprints.py [--scenario NAME] [--mode MODE] [--latency S]
+                                             [--throttle P] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+import mockjira
+
+
+def issue(summary, issuetype="Task", children=None, **fields):
+    node = {"fields": {"summary": summary, "issuetype": issuetype, **fields}}
+    if children:
+        node["children"] = children
+    return node
+
+
+def wide(count=1000):
+    """One epic with many direct children."""
+    return [
+        issue(
+            "{{ version }} epic",
+            "Epic",
+            [
+                issue(
+                    f"{{{{ version }}}} task {idx}",
+                    description="A task of the {{ version }} release",
+                    labels=["bench", "{{ version }}"],
+                )
+                for idx in range(count)
+            ],
+        )
+    ]
+
+
+def deep(depth=9):
+    """Two binary trees of issues, 2^(depth + 1) - 2 issues in total."""
+
+    def level(remaining, path):
+        if not remaining:
+            return None
+        return [
+            issue(
+                f"{{{{ version }}}} node {path}{idx}",
+                children=level(remaining - 1, f"{path}{idx}."),
+            )
+            for idx in range(2)
+        ]
+
+    return level(depth, "")
+
+
+def sprint_heavy(count=400):
+    """Many issues spread over the upcoming sprints, using the sprint template functions."""
+    return [
+        issue(
+            f"{{{{ version }}}} sprint task {idx}",
+            Sprint=[
+                f"{{{{ relative_sprints(active_sprint(), {idx % 6}) }}}}",
+            ],
+            duedate=f"{{{{ relative_weeks(start, {idx % 12}) }}}}",
+        )
+        for idx in range(count)
+    ]
+
+
+def large(epics=12, stories=10, tasks=10):
+    """A three level tree with more than a thousand issues."""
+    return [
+        issue(
+            f"{{{{ version }}}} epic {epic}",
+            "Epic",
+            [
+                issue(
+                    f"{{{{ version }}}} story {epic}.{story}",
+                    "Story",
+                    [
+                        issue(
+                            f"{{{{ version }}}} task {epic}.{story}.{task}",
+                            "Sub-task",
+                            description="{{ version }} {{ start }}",
+                        )
+                        for task in range(tasks)
+                    ],
+                    labels=["bench"],
+                )
+                for story in range(stories)
+            ],
+        )
+        for epic in range(epics)
+    ]
+
+
+def loop(count=1000):
+    """Like wide, but generating the children with a single foreach issue."""
+    return [
+        issue(
+            "{{ version }} epic",
+            "Epic",
+            [
+                {
+                    "foreach": f"range({count})",
+                    "as": "idx",
+                    **issue(
+                        "{{ version }} task {{ idx }}",
+                        description="A task of the {{ version }} release",
+                        labels=["bench", "{{ version }}"],
+                    ),
+                }
+            ],
+        )
+    ]
+
+
+def linked(count=500):
+    """A chain of tasks, each one blocked by the one before it."""
+    return [
+        {
+            "foreach": f"range({count})",
+            "as": "idx",
+            "id": "task-{{ idx }}",
+            "links": [{"type": "Blocks", "outward": "task-{{ idx + 1 }}"}],
+            **issue("{{ version }} step {{ idx }}"),
+        },
+        {"id": f"task-{count}", **issue("{{ version }} done")},
+    ]
+
+
+SCENARIOS = {
+    "wide": wide,
+    "loop": loop,
+    "linked": linked,
+    "deep": deep,
+    "sprint-heavy": sprint_heavy,
+    "large": large,
+}
+
+# Creation mode => apply_plan arguments, "stream" renders issues during apply using stream_plan
+MODES = {
+    "serial": {},
+    "jobs8": {"jobs": 8},
+    "bulk": {"bulk": True},
+    "bulk-jobs4": {"bulk": True, "jobs": 4},
+    "stream": {"stream": True},
+    "stream-bulk": {"stream": True, "bulk": True},
+}
+
+
+def count_issues(issues):
+    return sum(1 + count_issues(node.get("children", [])) for node in issues)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def mock_request(url, path, method="GET"):
+    with urllib.request.urlopen(urllib.request.Request(url + path, method=method)) as r:
+        return json.loads(r.read() or "null")
+
+
+def run_worker(scenario, mode, url, rate):
+    """Plan and apply a single scenario in this process and print the results as JSON."""
+    from jirablueprint.jirablueprint import JiraBlueprint
+    from jirablueprint.profiling import Profiler
+
+    config = {
+        "services": {
+            "mock": {
+                "url": url,
+                "username": "bench",
+                "token": "bench",
+                "transport": {"rate": rate},
+            }
+        },
+        "tools": {
+            "jirablueprint": {
+                "defaults": {
+                    "project": mockjira.PROJECT["key"],
+                    "board": mockjira.BOARD,
+                },
+                "cache": {"enabled": False},
+            }
+        },
+    }
+    issues = SCENARIOS[scenario]()
+    args = {"version": "1.0", "start": time.strftime("%Y-%m-%d")}
+
+    mock_request(url, "/mock/reset", "POST")
+    applyargs = dict(MODES[mode])
+    stream = applyargs.pop("stream", False)
+
+    profiler = Profiler()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        blueprint = JiraBlueprint(config, "mock", profiler=profiler)
+        if stream:
+            plan = blueprint.stream_plan(issues, args)
+        else:
+            plan = blueprint.plan_issues(issues, args)
+        planned = time.perf_counter()
+        created = blueprint.apply_plan(plan, **applyargs)
+    end = time.perf_counter()
+
+    stats = mock_request(url, "/mock/stats")
+    http = profiler.report()["http"]
+    print(
+        json.dumps(
+            {
+                "scenario": scenario,
+                "mode": mode,
+                "issues": len(created),
+                "wall": end - start,
+                "plan": planned - start,
+                "requests": stats["total"],
+                "links": stats["links"],
+                "throttled": stats["throttled"],
+                "retries": sum(entry["retries"] for entry in http.values()),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+        )
+    )
+
+
+def start_mock(args):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "mockjira.py"),
+            "--latency",
+            str(args.latency),
+            "--jitter",
+            str(args.jitter),
+            "--throttle",
+            str(args.throttle),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line.startswith("Listening on "):
+        proc.kill()
+        raise Exception(f"Could not start the mock Jira server: {line}")
+    return proc, line.split()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--mode", action="append", choices=list(MODES))
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--throttle", type=float, default=0.0)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Client side request rate limit, by default only slowing down when throttled. "
+        "0 disables the limiter",
+    )
+    parser.add_argument("--url", help="Use an already running mock server")
+    parser.add_argument("--output", help="Save the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare to results saved with --output")
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker, args.url, args.rate)
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fd:
+            baseline = {(r["scenario"], r["mode"]): r for r in json.load(fd)}
+
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_mock(args)
+
+    results = []
+    try:
+        print(
+            f"{'scenario':14} {'mode':11} {'issues':>6} {'wall s':>8} {'plan s':>8} "
+            f"{'requests':>8} {'retries':>7} {'rss MB':>7}"
+        )
+        for scenario in args.scenario or SCENARIOS:
+            for mode in args.mode or MODES:
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--url", url]
+                    + (["--rate", str(args.rate)] if args.rate is not None else [])
+                    + ["--worker", scenario, mode],
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                ).stdout
+                result = json.loads(output.strip().split("\n")[-1])
+                results.append(result)
+
+                line = (
+                    f"{scenario:14} {mode:11} {result['issues']:6} {result['wall']:8.2f} "
+                    f"{result['plan']:8.2f} {result['requests']:8} {result['retries']:7} "
+                    f"{result['peak_rss_mb']:7.1f}"
+                )
+                before = baseline.get((scenario, mode))
+                if before:
+                    line += (
+                        f"  wall {(result['wall'] / before['wall'] - 1) * 100:+.0f}%"
+                        f" requests {result['requests'] - before['requests']:+d}"
+                        f" rss {result['peak_rss_mb'] - before['peak_rss_mb']:+.1f}"
+                    )
+                print(line, flush=True)
+    finally:
+        if proc:
+            proc.kill()
+
+    if args.output:
+        with open(args.output, "w") as fd:
+            json.dump(results, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Startup time and import regression check for the jirabp command line.
+
+Runs common commands that should not need a Jira client in a fresh interpreter, against a dummy
+service with a warm metadata cache, and reports the best wall time of each. Exits non-zero if any
+of them imported a module it should not need, e.g. the network stack for listing templates.
+
+Usage: python benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from jirablueprint.cache import MetadataCache
+
+CONFIG = """
+services:
+  jira:
+    url: https://jira.invalid
+    username: nobody
+    token: none
+tools:
+  jirablueprint:
+    cache:
+      directory: {cachedir}
+"""
+
+TEMPLATE = """
+release:
+  args:
+    version:
+      required: true
+      description: The version to release
+  issues:
+    - fields:
+        issuetype: Task
+        summary: "Release {{ version }}"
+"""
+
+FIELDS = [
+    {"id": "summary", "name": "Summary", "schema": {"type": "string"}},
+    {"id": "issuetype", "name": "Issue Type", "schema": {"type": "issuetype"}},
+]
+
+# Modules that must not be imported, by scenario
+NETWORK = ["jira", "requests", "urllib3", "oauthlib"]
+TEMPLATING = ["jinja2", "type_enforced"]
+
+SCENARIOS = [
+    ("import", None, NETWORK + TEMPLATING),
+    ("--help", ["--help"], NETWORK + TEMPLATING),
+    ("list templates", ["fromtemplate", "-f", "{templates}"], NETWORK + TEMPLATING),
+    (
+        "plan only",
+        [
+            "fromtemplate",
+            "-f",
+            "{templates}",
+            "--plan-out",
+            "-",
+            "release",
+            "version=1",
+        ],
+        NETWORK,
+    ),
+]
+
+CHILD = """
+import json, sys
+from jirablueprint.cli import main
+argv = json.loads(sys.argv[1])
+if argv is not None:
+    try:
+        main(argv, prog_name="jirabp")
+    except SystemExit as e:
+        if e.code:
+            raise
+print(json.dumps(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+def run(argv, env):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(argv)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        raise Exception(f"jirabp {argv} failed:\n{proc.stderr}")
+    return elapsed, set(json.loads(proc.stderr.strip().split("\n")[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cachedir = os.path.join(tmpdir, "cache")
+        configpath = os.path.join(tmpdir, "config.yaml")
+        templates = os.path.join(tmpdir, "templates")
+
+        with open(configpath, "w") as fd:
+            fd.write(CONFIG.format(cachedir=cachedir))
+        os.chmod(configpath, 0o600)
+
+        os.makedirs(templates)
+        with open(os.path.join(templates, "release.yaml"), "w") as fd:
+            fd.write(TEMPLATE)
+
+        MetadataCache("jira", {"directory": cachedir}).get("fields", lambda: FIELDS)
+
+        failed = False
+        for name, argv, forbidden in SCENARIOS:
+            if argv is not None:
+                argv = ["--config", configpath] + [
+                    arg.format(templates=templates) for arg in argv
+                ]
+
+            best = None
+            for _ in range(args.repeat):
+                elapsed, modules = run(argv, os.environ)
+                best = elapsed if best is None else min(best, elapsed)
+
+            imported = [mod for mod in forbidden if mod in modules]
+            status = "ok" if not imported else "imports " + ", ".join(imported)
+            failed = failed or bool(imported)
+            print(f"{name:20} {best * 1000:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
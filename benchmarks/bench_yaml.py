@@ -0,0 +1,105 @@
+"""Compare round trip and fast YAML loading on a generated template directory.
+
+Usage: python benchmarks/bench_yaml.py [--files N] [--templates N] [--issues N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from jirablueprint.catalog import TemplateCatalog
+from jirablueprint.util import fast_yaml, yaml
+
+TEMPLATE = """
+{name}:
+  # A generated template
+  args:
+    version:
+      required: true
+      description: The version to release
+    date:
+      description: The release date
+  issues:
+{issues}
+"""
+
+ISSUE = """
+    - summary: "Release {{{{ version }}}} step {idx}"
+      issuetype: Task
+      description: |
+        Step {idx} of the release of {{{{ version }}}}.
+        Make sure to check the checklist.
+      labels: [release, step-{idx}]
+      sprint: "{{{{ sprint_for_date(date) }}}}"
+      sub-issues:
+        - summary: "Review step {idx}"
+          issuetype: Sub-task
+"""
+
+
+def generate(path, files, templates, issues):
+    for fileidx in range(files):
+        with open(os.path.join(path, f"templates{fileidx}.yaml"), "w") as fd:
+            for templateidx in range(templates):
+                fd.write(
+                    TEMPLATE.format(
+                        name=f"template_{fileidx}_{templateidx}",
+                        issues="".join(ISSUE.format(idx=idx) for idx in range(issues)),
+                    )
+                )
+
+
+def timed(label, func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:40} {best * 1000:10.1f} ms")
+    return best
+
+
+def load_all(loader, path):
+    for name in os.listdir(path):
+        with open(os.path.join(path, name)) as fd:
+            loader.load(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--templates", type=int, default=10)
+    parser.add_argument("--issues", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        templatedir = os.path.join(tmpdir, "templates")
+        cachedir = os.path.join(tmpdir, "cache")
+        os.makedirs(templatedir)
+        generate(templatedir, args.files, args.templates, args.issues)
+
+        print(
+            f"{args.files} files, {args.files * args.templates} templates, "
+            f"parser {fast_yaml.Parser.__name__}\n"
+        )
+
+        roundtrip = timed("Round trip load", lambda: load_all(yaml, templatedir))
+        fast = timed("Fast load", lambda: load_all(fast_yaml, templatedir))
+        print(f"{'Speedup':40} {roundtrip / fast:10.1f} x\n")
+
+        name = f"template_{args.files - 1}_{args.templates - 1}"
+        timed(
+            "Catalog cold (index and load)",
+            lambda: TemplateCatalog(templatedir, cachedir).load(name),
+            repeat=1,
+        )
+        timed(
+            "Catalog warm (index and load)",
+            lambda: TemplateCatalog(templatedir, cachedir).load(name),
+        )
+
+
+if __name__ == "__main__":
+    main()
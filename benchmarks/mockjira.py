@@ -0,0 +1,503 @@
+"""A local stand-in for the Jira endpoints jirablueprint uses, for offline benchmarks.
+
+Serves server info, fields, projects, create metadata, issue create and bulk create, fetching
+and editing created issues, searching them by parent or label, issue link types and links, agile board
+sprints and adding issues to sprints. Every response can be delayed
+and a share of the requests can be answered with 429 to exercise the retry path.
+
+Usage: python benchmarks/mockjira.py [--port N] [--latency S] [--jitter S] [--throttle P]
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PROJECT = {"id": "10000", "key": "BENCH", "name": "Benchmark"}
+BOARD = 1
+
+SPRINT_FIELD = "customfield_10020"
+
+FIELDS = [
+    ("summary", "Summary", {"type": "string", "system": "summary"}),
+    ("description", "Description", {"type": "string", "system": "description"}),
+    ("issuetype", "Issue Type", {"type": "issuetype", "system": "issuetype"}),
+    ("project", "Project", {"type": "project", "system": "project"}),
+    ("parent", "Parent", {"type": "issuelink", "system": "parent"}),
+    ("labels", "Labels", {"type": "array", "items": "string", "system": "labels"}),
+    ("assignee", "Assignee", {"type": "user", "system": "assignee"}),
+    ("priority", "Priority", {"type": "priority", "system": "priority"}),
+    ("duedate", "Due date", {"type": "date", "system": "duedate"}),
+    (
+        "components",
+        "Components",
+        {"type": "array", "items": "component", "system": "components"},
+    ),
+    (
+        SPRINT_FIELD,
+        "Sprint",
+        {
+            "type": "array",
+            "items": "json",
+            "custom": "com.pyxis.greenhopper.jira:gh-sprint",
+            "customId": 10020,
+        },
+    ),
+    (
+        "customfield_10016",
+        "Story Points",
+        {
+            "type": "number",
+            "custom": "com.atlassian.jira.plugin.system.customfieldtypes:float",
+        },
+    ),
+]
+
+LINKTYPES = [
+    ("10000", "Blocks", "is blocked by", "blocks"),
+    ("10003", "Relates", "relates to", "relates to"),
+]
+
+ISSUETYPES = [
+    ("10001", "Epic", False),
+    ("10002", "Story", False),
+    ("10003", "Task", False),
+    ("10004", "Sub-task", True),
+]
+
+
+def make_sprints(count, length=timedelta(weeks=2)):
+    """Consecutive sprints on the benchmark board, the first one active since a week ago."""
+    start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) - timedelta(weeks=1)
+    sprints = []
+    for idx in range(count):
+        sprintstart = start + idx * length
+        sprints.append(
+            {
+                "id": 100 + idx,
+                "self": f"/rest/agile/1.0/sprint/{100 + idx}",
+                "state": "active" if idx == 0 else "future",
+                "name": f"Sprint {idx + 1}",
+                "startDate": sprintstart.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "endDate": (sprintstart + length).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "originBoardId": BOARD,
+            }
+        )
+    return sprints
+
+
+class MockJira:
+    """State of the mock instance: created issues, sprint membership and request counts."""
+
+    def __init__(
+        self, latency=0.0, jitter=0.0, throttle=0.0, retry_after=0, sprints=26
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.sprints = make_sprints(sprints)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.issues = {}
+            self.sprint_issues = {}
+            self.links = []
+            self.requests = {}
+            self.throttled = 0
+            self._next = 1
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "total": sum(self.requests.values()),
+                "throttled": self.throttled,
+                "issues": len(self.issues),
+                "sprint_issues": sum(len(keys) for keys in self.sprint_issues.values()),
+                "links": len(self.links),
+            }
+
+    def create(self, fields):
+        with self._lock:
+            key = f"{PROJECT['key']}-{self._next}"
+            self._next += 1
+            self.issues[key] = fields
+        return {
+            "id": str(10000 + len(self.issues)),
+            "key": key,
+            "self": f"/rest/api/2/issue/{key}",
+        }
+
+    def search(self, jql):
+        """Keys of the issues matching the parent and label queries jirablueprint sends."""
+        jql = re.sub(r"\s+ORDER BY .*$", "", jql, flags=re.IGNORECASE)
+        parents = re.fullmatch(r"parent in \(([^)]*)\)", jql)
+        label = re.fullmatch(r'labels = "([^"]+)"', jql)
+        with self._lock:
+            if parents:
+                keys = set(key.strip() for key in parents.group(1).split(","))
+                return [
+                    key
+                    for key, fields in self.issues.items()
+                    if fields.get("parent", {}).get("key") in keys
+                ]
+            elif label:
+                return [
+                    key
+                    for key, fields in self.issues.items()
+                    if label.group(1) in fields.get("labels", [])
+                ]
+        raise ValueError(f"Unsupported JQL {jql}")
+
+    def edit(self, key, fields):
+        with self._lock:
+            if key not in self.issues:
+                return False
+            self.issues[key] = {**self.issues[key], **fields}
+            return True
+
+    def link(self, linktype, inward, outward):
+        with self._lock:
+            if inward not in self.issues or outward not in self.issues:
+                return False
+            self.links.append((linktype, inward, outward))
+            return True
+
+    def add_to_sprint(self, sprintid, keys):
+        with self._lock:
+            self.sprint_issues.setdefault(sprintid, []).extend(keys)
+
+    def should_throttle(self):
+        if self.throttle and random.random() < self.throttle:
+            with self._lock:
+                self.throttled += 1
+            return True
+        return False
+
+    def delay(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+
+def createmeta():
+    fields = {
+        fieldid: {
+            "required": fieldid in ("summary", "issuetype", "project"),
+            "schema": schema,
+            "name": name,
+            "key": fieldid,
+        }
+        for fieldid, name, schema in FIELDS
+    }
+    return {
+        "projects": [
+            {
+                **PROJECT,
+                "issuetypes": [
+                    {"id": typeid, "name": name, "subtask": subtask, "fields": fields}
+                    for typeid, name, subtask in ISSUETYPES
+                ],
+            }
+        ]
+    }
+
+
+class MockJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, don't let Nagle's algorithm delay keep-alive responses
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("GET", r"/rest/api/2/serverInfo", "server_info"),
+        ("GET", r"/rest/api/2/field", "fields"),
+        ("GET", r"/rest/api/2/project/(?P<key>[^/]+)", "project"),
+        ("GET", r"/rest/api/2/issue/createmeta", "createmeta"),
+        ("POST", r"/rest/api/2/issue", "create_issue"),
+        ("POST", r"/rest/api/2/issue/bulk", "create_issues"),
+        ("GET", r"/rest/api/2/issue/(?P<key>[^/]+)", "issue"),
+        ("PUT", r"/rest/api/2/issue/(?P<key>[^/]+)", "edit_issue"),
+        ("GET", r"/rest/api/2/search", "search"),
+        ("GET", r"/rest/api/2/search/jql", "search_jql"),
+        ("GET", r"/rest/api/2/issueLinkType", "link_types"),
+        ("POST", r"/rest/api/2/issueLink", "create_link"),
+        ("GET", r"/rest/agile/1.0/board/(?P<board>\d+)/sprint", "board_sprints"),
+        ("POST", r"/rest/agile/1.0/sprint/(?P<sprint>\d+)/issue", "sprint_issues"),
+        ("GET", r"/mock/stats", "stats"),
+        ("POST", r"/mock/reset", "reset"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _respond(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        body = None
+        if method in ("POST", "PUT"):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or "null")
+
+        for routemethod, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if routemethod == method and match:
+                break
+        else:
+            self._respond(404, {"errorMessages": [f"No mock for {method} {url.path}"]})
+            return
+
+        if not url.path.startswith("/mock/"):
+            self.mock.count(f"{method} {pattern}")
+            self.mock.delay()
+            if self.mock.should_throttle():
+                self._respond(
+                    429,
+                    {"errorMessages": ["Rate limit exceeded"]},
+                    {"Retry-After": str(self.mock.retry_after)},
+                )
+                return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, response = getattr(self, name)(body, params, **match.groupdict())
+        self._respond(status, response)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def server_info(self, body, params):
+        return 200, {
+            "baseUrl": f"http://{self.headers.get('Host')}",
+            "version": "1001.0.0",
+            "versionNumbers": [1001, 0, 0],
+            "deploymentType": "Cloud",
+        }
+
+    def fields(self, body, params):
+        return 200, [
+            {
+                "id": fieldid,
+                "key": fieldid,
+                "name": name,
+                "custom": fieldid.startswith("customfield_"),
+                "schema": schema,
+                "clauseNames": [fieldid],
+            }
+            for fieldid, name, schema in FIELDS
+        ]
+
+    def project(self, body, params, key):
+        if key not in (PROJECT["key"], PROJECT["id"]):
+            return 404, {"errorMessages": [f"No project {key}"]}
+        return 200, PROJECT
+
+    def createmeta(self, body, params):
+        return 200, createmeta()
+
+    def create_issue(self, body, params):
+        if not body.get("fields", {}).get("summary"):
+            return 400, {
+                "errors": {"summary": "You must specify a summary of the issue."}
+            }
+        return 201, self.mock.create(body["fields"])
+
+    def create_issues(self, body, params):
+        issues = []
+        errors = []
+        for idx, update in enumerate(body.get("issueUpdates", [])):
+            if not update.get("fields", {}).get("summary"):
+                errors.append(
+                    {
+                        "status": 400,
+                        "failedElementNumber": idx,
+                        "elementErrors": {
+                            "errors": {
+                                "summary": "You must specify a summary of the issue."
+                            }
+                        },
+                    }
+                )
+            else:
+                issues.append(self.mock.create(update["fields"]))
+        return (201 if issues else 400), {"issues": issues, "errors": errors}
+
+    def issue(self, body, params, key):
+        if key not in self.mock.issues:
+            return 404, {"errorMessages": ["Issue does not exist"]}
+        return 200, {
+            "id": key.split("-")[1],
+            "key": key,
+            "self": f"/rest/api/2/issue/{key}",
+            "fields": self.mock.issues[key],
+        }
+
+    def edit_issue(self, body, params, key):
+        if not self.mock.edit(key, body.get("fields", {})):
+            return 404, {"errorMessages": ["Issue does not exist"]}
+        return 204, None
+
+    def _search_page(self, params, start):
+        try:
+            keys = self.mock.search(params.get("jql", ""))
+        except ValueError as e:
+            return None, {"errorMessages": [str(e)]}
+        size = int(params.get("maxResults", 50))
+        issues = [
+            {"key": key, "fields": self.mock.issues[key]}
+            for key in keys[start : start + size]
+        ]
+        return start + size < len(keys), {"issues": issues, "total": len(keys)}
+
+    def search(self, body, params):
+        start = int(params.get("startAt", 0))
+        more, page = self._search_page(params, start)
+        if more is None:
+            return 400, page
+        return 200, {**page, "startAt": start}
+
+    def search_jql(self, body, params):
+        # Token based pagination as on Jira Cloud, the token is just the offset here
+        start = int(params.get("nextPageToken", 0))
+        more, page = self._search_page(params, start)
+        if more is None:
+            return 400, page
+        page.pop("total")
+        if more:
+            page["nextPageToken"] = str(start + len(page["issues"]))
+        return 200, {**page, "isLast": not more}
+
+    def link_types(self, body, params):
+        return 200, {
+            "issueLinkTypes": [
+                {"id": typeid, "name": name, "inward": inward, "outward": outward}
+                for typeid, name, inward, outward in LINKTYPES
+            ]
+        }
+
+    def create_link(self, body, params):
+        if body["type"]["name"] not in [name for _, name, _, _ in LINKTYPES]:
+            return 404, {
+                "errorMessages": [f"No issue link type {body['type']['name']}"]
+            }
+        if not self.mock.link(
+            body["type"]["name"],
+            body["inwardIssue"]["key"],
+            body["outwardIssue"]["key"],
+        ):
+            return 404, {"errorMessages": ["Issue does not exist"]}
+        return 201, None
+
+    def board_sprints(self, body, params, board):
+        states = params.get("state", "active,future,closed").split(",")
+        sprints = [sprint for sprint in self.mock.sprints if sprint["state"] in states]
+        start = int(params.get("startAt", 0))
+        size = int(params.get("maxResults", 50))
+        return 200, {
+            "maxResults": size,
+            "startAt": start,
+            "total": len(sprints),
+            "isLast": start + size >= len(sprints),
+            "values": sprints[start : start + size],
+        }
+
+    def sprint_issues(self, body, params, sprint):
+        keys = body.get("issues", [])
+        if len(keys) > 50:
+            return 400, {"errorMessages": ["Too many issues, the maximum is 50"]}
+        self.mock.add_to_sprint(int(sprint), keys)
+        return 204, None
+
+    def stats(self, body, params):
+        return 200, self.mock.stats()
+
+    def reset(self, body, params):
+        self.mock.reset()
+        return 204, None
+
+
+class MockJiraServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing connections, e.g. after a 429, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(mock, host="127.0.0.1", port=0):
+    """Start serving mock in a background thread, returns the server."""
+    server = MockJiraServer((host, port), MockJiraHandler)
+    server.mock = mock
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds to delay each response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Up to this many seconds extra delay"
+    )
+    parser.add_argument(
+        "--throttle",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with 429, e.g. 0.05",
+    )
+    parser.add_argument(
+        "--retry-after", type=int, default=0, help="Retry-After header of 429 responses"
+    )
+    parser.add_argument("--sprints", type=int, default=26, help="Number of sprints")
+    args = parser.parse_args()
+
+    mock = MockJira(
+        args.latency, args.jitter, args.throttle, args.retry_after, args.sprints
+    )
+    server = serve(mock, args.host, args.port)
+    print(f"Listening on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import threading
+import time
+
+# Default time to live in seconds for each kind of cached metadata. Fields, create metadata and
+# issue link types rarely change, sprints are created and started more frequently.
+DEFAULT_TTLS = {
+    "fields": 24 * 60 * 60,
+    "createmeta": 24 * 60 * 60,
+    "linktypes": 24 * 60 * 60,
+    "sprints": 60 * 60,
+}
+
+
+def user_cache_dir():
+    if sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    elif sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/AppData/Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "jirablueprint")
+
+
+class MetadataCache:
+    """On-disk cache for Jira metadata, one directory per service.
+
+    Each entry is a JSON file named after its kind and an optional key (e.g. the board id for
+    sprints), containing the time it was fetched and the data.
+    """
+
+    def __init__(self, service, config=None, refresh=False):
+        config = config or {}
+        self.service = service
+        self.root = os.path.expanduser(config.get("directory", user_cache_dir()))
+        self.directory = os.path.join(self.root, service)
+        self.ttls = {**DEFAULT_TTLS, **config.get("ttl", {})}
+        self.enabled = config.get("enabled", True)
+        self.refresh = refresh
+
+    def _path(self, kind, key=None):
+        name = kind if key is None else f"{kind}-{key}"
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        return os.path.join(self.directory, name + ".json")
+
+    def _read(self, path):
+        try:
+            with open(path) as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        tmppath = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmppath, "w") as fd:
+            json.dump({"fetched": time.time(), "data": data}, fd)
+        os.replace(tmppath, path)
+
+    def is_fresh(self, kind, entry):
+        if entry is None:
+            return False
+        return time.time() - entry["fetched"] < self.ttls.get(kind, 0)
+
+    def get(self, kind, fetch, key=None):
+        """Return cached data for kind/key, calling fetch() if missing, expired or refreshing."""
+        if not self.enabled or not self.ttls.get(kind, 0):
+            return fetch()
+
+        path = self._path(kind, key)
+        if not self.refresh:
+            entry = self._read(path)
+            if self.is_fresh(kind, entry):
+                return entry["data"]
+
+        data = fetch()
+        self._write(path, data)
+        return data
+
+    def entries(self):
+        """Yield (filename, kind, fetched timestamp, size, fresh) for each cache entry."""
+        if not os.path.isdir(self.directory):
+            return
+
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            entry = self._read(path)
+            kind = name[: -len(".json")].split("-", 1)[0]
+            yield (
+                name,
+                kind,
+                entry["fetched"] if entry else None,
+                os.path.getsize(path),
+                self.is_fresh(kind, entry),
+            )
+
+    def clear(self, kind=None):
+        """Remove all entries, or only those of the given kind. Returns the number removed."""
+        removed = 0
+        for name, entrykind, _, _, _ in list(self.entries()):
+            if kind is None or entrykind == kind:
+                os.unlink(os.path.join(self.directory, name))
+                removed += 1
+        return removed
@@ -0,0 +1,229 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+
+import click
+
+from .util import fast_yaml, yaml
+
+INDEX_VERSION = 3
+
+# Top level keys of a template file, i.e. the template names
+TEMPLATE_NAME_RE = re.compile(
+    r"""^(?:"([^"]+)"|'([^']+)'|([^\s#'"][^:#]*?))\s*:(?:\s|$)"""
+)
+
+
+def _encode_value(value):
+    # YAML has timestamps, JSON doesn't
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    elif isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Can't cache {type(value).__name__} values")
+
+
+def _decode_value(obj):
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.datetime.fromisoformat(obj["__datetime__"])
+        elif "__date__" in obj:
+            return datetime.date.fromisoformat(obj["__date__"])
+    return obj
+
+
+class TemplateCatalog:
+    """Templates from a YAML file or a directory of YAML files, indexed by name.
+
+    The index maps each template name to its file and line, along with the args needed to list
+    the templates, and records the mtime and size of each file. Parsed files are cached as well.
+    Files are only parsed again when their mtime or size changes, and only the file containing
+    the requested template is loaded.
+    """
+
+    def __init__(self, path, cachedir):
+        self.path = path
+        self.isdir = os.path.isdir(path)
+
+        pathhash = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        self.cachedir = os.path.join(cachedir, "templates", pathhash)
+        self.indexpath = os.path.join(self.cachedir, "index.json")
+
+        self._index = None
+
+    def _files(self):
+        if not self.isdir:
+            return [self.path]
+
+        return sorted(
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.endswith(".yaml")
+        )
+
+    def _parsecache_path(self, filepath):
+        return os.path.join(self.cachedir, os.path.basename(filepath) + ".json")
+
+    def _read_index(self):
+        try:
+            with open(self.indexpath) as fd:
+                index = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+
+        if index.get("version") != INDEX_VERSION:
+            return {}
+        return index["files"]
+
+    def _write(self, path, writer):
+        os.makedirs(self.cachedir, exist_ok=True)
+        tmppath = f"{path}.{os.getpid()}.tmp"
+        with open(tmppath, "w") as fd:
+            writer(fd)
+        os.replace(tmppath, path)
+
+    def _parse(self, filepath, stat):
+        with open(filepath) as fd:
+            data = fast_yaml.load(fd) or {}
+
+        # Parsed files are stored as JSON like the metadata cache, loading a pickle from a
+        # configurable directory could run arbitrary code. Files with values JSON can't
+        # represent, e.g. non-string keys, are parsed every time instead.
+        try:
+            content = json.dumps(
+                {
+                    "version": INDEX_VERSION,
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "data": data,
+                },
+                default=_encode_value,
+            )
+            cacheable = json.loads(content, object_hook=_decode_value)["data"] == data
+        except (TypeError, ValueError):
+            cacheable = False
+
+        if cacheable:
+            self._write(self._parsecache_path(filepath), lambda fd: fd.write(content))
+        return data
+
+    def _load_file(self, filepath):
+        stat = os.stat(filepath)
+        try:
+            with open(self._parsecache_path(filepath)) as fd:
+                cached = json.load(fd, object_hook=_decode_value)
+            if (
+                cached.get("version") == INDEX_VERSION
+                and cached["mtime"] == stat.st_mtime
+                and cached["size"] == stat.st_size
+            ):
+                return cached["data"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+        return self._parse(filepath, stat)
+
+    def _index_file(self, filepath, stat):
+        data = self._parse(filepath, stat)
+
+        lines = {}
+        with open(filepath) as fd:
+            for lineno, line in enumerate(fd, 1):
+                match = TEMPLATE_NAME_RE.match(line)
+                if match:
+                    lines[next(group for group in match.groups() if group)] = lineno
+
+        templates = {}
+        for name, template in data.items():
+            args = template.get("args", {}) if isinstance(template, dict) else {}
+            templates[name] = {
+                "line": lines.get(name),
+                "args": {
+                    arg: {
+                        "required": bool((argdata or {}).get("required", False)),
+                        "description": (argdata or {}).get("description", ""),
+                    }
+                    for arg, argdata in args.items()
+                },
+            }
+
+        return {"mtime": stat.st_mtime, "size": stat.st_size, "templates": templates}
+
+    @property
+    def index(self):
+        """The index of all template files, refreshed for files that have changed."""
+        if self._index is not None:
+            return self._index
+
+        previous = self._read_index()
+        index = {}
+        changed = False
+        for filepath in self._files():
+            stat = os.stat(filepath)
+            entry = previous.get(filepath)
+            if (
+                entry is None
+                or entry["mtime"] != stat.st_mtime
+                or entry["size"] != stat.st_size
+            ):
+                entry = self._index_file(filepath, stat)
+                changed = True
+            index[filepath] = entry
+
+        for filepath in previous.keys() - index.keys():
+            try:
+                os.unlink(self._parsecache_path(filepath))
+            except OSError:
+                pass
+
+        if changed or index.keys() != previous.keys():
+            self._write(
+                self.indexpath,
+                lambda fd: json.dump({"version": INDEX_VERSION, "files": index}, fd),
+            )
+
+        seen = {}
+        for filepath, entry in index.items():
+            duplicates = entry["templates"].keys() & seen.keys()
+            if duplicates:
+                raise click.UsageError(
+                    f"Duplicate template names in {os.path.basename(filepath)}: "
+                    + ",".join(sorted(duplicates))
+                )
+            seen.update(dict.fromkeys(entry["templates"], filepath))
+
+        self._index = index
+        return index
+
+    def templates(self):
+        """Yield (name, args) for each template, without parsing any unchanged files."""
+        for entry in self.index.values():
+            for name, template in entry["templates"].items():
+                yield name, template["args"]
+
+    def find(self, name):
+        """Return (file, line) of the template name, or None if there is no such template."""
+        for filepath, entry in self.index.items():
+            if name in entry["templates"]:
+                return filepath, entry["templates"][name]["line"]
+        return None
+
+    def __contains__(self, name):
+        return self.find(name) is not None
+
+    def load(self, name):
+        """Load the template name, parsing only the file that contains it."""
+        location = self.find(name)
+        if location is None:
+            raise KeyError(name)
+        return self._load_file(location[0])[name]
+
+    def load_roundtrip(self, name):
+        """Load the template name preserving comments and formatting, e.g. for editing."""
+        location = self.find(name)
+        if location is None:
+            raise KeyError(name)
+        with open(location[0]) as fd:
+            return yaml.load(fd)[name]
@@ -1,11 +1,352 @@
+import csv
+import itertools
 import json
 import os.path
+import shlex
 import stat
+import tempfile
+import time
+from functools import partial
 
 import click
 
+from .cache import DEFAULT_TTLS
+from .catalog import TemplateCatalog
+from .client import BlueprintClient
+from .fanout import ServiceFanout, jira_services
+from .fields import AmbiguousFieldError
 from .jirablueprint import JiraBlueprint
-from .util import compile_issue_template, yaml
+from .journal import Journal, JournalMismatchError
+from .plan import Plan
+from .profiling import Profiler
+from .util import compile_issue_template, fast_yaml, read_args_file, yaml
+
+
+def run_reporting_errors(ctx, func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except click.ClickException:
+        raise
+    except Exception as e:
+        if ctx.debug:
+            raise
+        elif e.__cause__:
+            raise click.ClickException(f"{e}:\n\t{e.__cause__}") from e
+        else:
+            raise click.ClickException(str(e)) from e
+
+
+def template_catalog(ctx, fname=None):
+    template_path = fname or ctx.toolconfig.get(
+        "templates", ctx.toolconfig.get("template_file", None)
+    )
+
+    if not template_path:
+        raise click.UsageError(
+            "You need to either pass -f or set a template_file in the tool config"
+        )
+
+    return TemplateCatalog(os.path.expanduser(template_path), ctx.cache.root)
+
+
+def load_template(ctx, catalog, template_name):
+    with ctx.profiler.span("load template", "phase"):
+        if template_name not in catalog:
+            raise click.BadArgumentUsage(
+                f"Could not find template {template_name} in {catalog.path}"
+            )
+
+        return catalog.load(template_name)
+
+
+def resolve_assignee(ctx, assignee):
+    if not assignee:
+        return None
+
+    usermap = ctx.toolconfig.get("usermap", {}).get(ctx.jiraname, {})
+    if assignee not in usermap:
+        raise click.UsageError(f"Missing {assignee} in config's usermap")
+
+    return usermap[assignee]
+
+
+def instance_key(ctx, template, key, args):
+    """The idempotency key passed with --key or set in the template, rendered with args."""
+    key = key or template.get("key")
+    return ctx.render_key(str(key), args) if key else None
+
+
+def print_templates(templates, verbose=False):
+    if verbose:
+        print("Args starting with ? are optional\n")
+    for key, templateargs in templates:
+        args = ""
+        for arg, data in templateargs.items():
+            args += f" {arg}=" + ("required" if data["required"] else "optional")
+        print(f"jirabp fromtemplate {key:20} {args}")
+
+        if verbose:
+            for arg, data in templateargs.items():
+                argname = ("?" if not data["required"] else "") + arg
+                print(f"\t{argname:>40}: {data['description']}")
+
+
+def check_required_args(template, supplied_args):
+    for arg, argdata in template.get("args", {}).items():
+        if arg not in supplied_args and argdata.get("required", False):
+            raise click.BadArgumentUsage(
+                f"Missing argument '{arg}' ({argdata['description']})"
+            )
+
+
+def create_from_template(
+    ctx,
+    template,
+    template_name,
+    args,
+    parent=None,
+    assignee=None,
+    dry=False,
+    bulk=False,
+    jobs=1,
+    stream=False,
+    key=None,
+    resume_hint=None,
+):
+    """Plan and create one instance of template, returns a summary of the created issues."""
+    plan = run_reporting_errors(
+        ctx,
+        ctx.stream_plan if stream else ctx.plan_issues,
+        template["issues"],
+        args,
+        parent=parent,
+        assignee=assignee,
+        template=template_name,
+        key=instance_key(ctx, template, key, args),
+    )
+    created = apply_journaled(
+        ctx, plan, None, None, dry=dry, resume_hint=resume_hint, bulk=bulk, jobs=jobs
+    )
+    toplevel = sorted(
+        (path for path in created if "." not in path),
+        key=lambda path: [int(part) for part in path.split("-")],
+    )
+    keys = [created[path] for path in toplevel]
+    return f"{len(plan)} issues {' '.join(keys)}"
+
+
+def row_resume_hint(template_name, rowargs, key, journal_path):
+    # --resume can't be combined with --args-file, the row has to be continued on its own
+    command = ["jirabp", "fromtemplate"] + (["--key", key] if key else [])
+    command += [template_name] + [f"{name}={value}" for name, value in rowargs.items()]
+    return (
+        "continue this row with the same options but without --args-file: "
+        + shlex.join(command + ["--resume", journal_path])
+    )
+
+
+def instantiate_rows(
+    ctx,
+    template,
+    template_name,
+    supplied_args,
+    args_file,
+    parent=None,
+    assignee=None,
+    dry=False,
+    bulk=False,
+    jobs=1,
+    stream=False,
+    key=None,
+):
+    results = []
+    with click.open_file(args_file) as fd:
+        rows = read_args_file(fd, args_file)
+        for rownum in itertools.count(1):
+            try:
+                row = next(rows, None)
+            except (ValueError, csv.Error) as e:
+                raise click.UsageError(f"Could not read {args_file}: {e}") from e
+            if row is None:
+                break
+
+            rowargs = {**supplied_args, **row}
+            click.echo(f"Row {rownum}: " + " ".join(f"{k}={v}" for k, v in row.items()))
+            ctx.console.indent()
+            try:
+                check_required_args(template, rowargs)
+                summary = create_from_template(
+                    ctx,
+                    template,
+                    template_name,
+                    rowargs,
+                    parent=parent,
+                    assignee=assignee,
+                    dry=dry,
+                    bulk=bulk,
+                    jobs=jobs,
+                    stream=stream,
+                    key=key,
+                    resume_hint=partial(row_resume_hint, template_name, rowargs, key),
+                )
+                results.append((rownum, True, summary))
+            except click.ClickException as e:
+                click.echo(f"Error: {e.format_message()}", err=True)
+                results.append((rownum, False, e.format_message().split("\n")[0]))
+            finally:
+                ctx.console.dedent()
+
+    click.echo("\nResults:")
+    for rownum, success, message in results:
+        click.echo(f"  Row {rownum:<5} {'ok' if success else 'FAILED':6} {message}")
+
+    failed = sum(1 for _, success, _ in results if not success)
+    if failed:
+        raise click.ClickException(f"{failed} of {len(results)} rows failed")
+
+
+def new_journal_path(ctx, plan):
+    """A new journal file in the cache directory, unique even for runs started in the same second."""
+    directory = os.path.join(ctx.cache.directory, "journals")
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(
+        prefix=f"{plan.template or 'plan'}-{time.strftime('%Y%m%d-%H%M%S')}-",
+        suffix=".jsonl",
+        dir=directory,
+    )
+    os.close(fd)
+    return path
+
+
+def apply_journaled(
+    ctx, plan, journal_path, resume, dry=False, resume_hint=None, **kwargs
+):
+    """Apply plan, recording created issues in a journal.
+
+    resume_hint returns the instructions to continue a failed run given the journal path, by
+    default that is passing --resume to the same command.
+    """
+    autojournal = not journal_path and not resume
+
+    journal = None
+    try:
+        if resume:
+            journal = Journal(resume, plan, resume=True)
+        elif not dry:
+            journal = Journal(journal_path or new_journal_path(ctx, plan), plan)
+    except JournalMismatchError as e:
+        raise click.UsageError(str(e)) from e
+
+    try:
+        created = run_reporting_errors(
+            ctx, ctx.apply_plan, plan, dry=dry, journal=journal, **kwargs
+        )
+    except click.ClickException:
+        if journal and journal.created:
+            hint = (
+                resume_hint(journal.path)
+                if resume_hint
+                else f"continue with --resume {journal.path}"
+            )
+            click.echo(f"Created issues were recorded, {hint}", err=True)
+        raise
+    finally:
+        if journal:
+            journal.close()
+
+    if journal and autojournal:
+        os.unlink(journal.path)
+
+    return created
+
+
+def fromtemplate_remote(
+    client,
+    fname,
+    template_name,
+    args,
+    parent=None,
+    dry=False,
+    verbose=False,
+    assignee=None,
+    edit=False,
+    bulk=False,
+    jobs=1,
+    plan_out=None,
+    apply_plan=None,
+    journal_path=None,
+    resume=None,
+    args_file=None,
+    stream=False,
+    key=None,
+):
+    if edit or journal_path or resume or args_file or stream:
+        raise click.UsageError(
+            "--edit, --journal, --resume, --args-file and --stream can't be used with --server"
+        )
+
+    if apply_plan:
+        if template_name:
+            raise click.UsageError("--apply can't be combined with a template name")
+
+        try:
+            plan = json.load(apply_plan)
+        except ValueError as e:
+            raise click.UsageError(f"Invalid plan file {apply_plan.name}: {e}") from e
+
+        client.request(
+            "POST",
+            "/apply",
+            {
+                "service": client.service,
+                "plan": plan,
+                "dry": dry,
+                "bulk": bulk,
+                "jobs": jobs,
+            },
+        )
+        return
+
+    # The server may run in a different directory
+    fname = os.path.abspath(os.path.expanduser(fname)) if fname else None
+
+    if not template_name:
+        templates = client.request("GET", "/templates", file=fname)
+        print_templates(
+            ((template["name"], template["args"]) for template in templates), verbose
+        )
+        return
+
+    request = {
+        "service": client.service,
+        "file": fname,
+        "template": template_name,
+        "args": dict(kv.split("=", 1) for kv in args),
+        "parent": parent,
+        "assignee": assignee,
+        "key": key,
+    }
+
+    if plan_out:
+        plan = client.request("POST", "/plan", request)
+        json.dump(plan, plan_out, indent=2)
+        click.echo(f"Wrote plan for {len(plan['issues'])} issues to {plan_out.name}")
+        return
+
+    client.request(
+        "POST", "/fromtemplate", {**request, "dry": dry, "bulk": bulk, "jobs": jobs}
+    )
+
+
+def report_profile(profiler, profile, trace):
+    if profile == "json":
+        click.echo(profiler.format_json(), err=True, nl=False)
+    elif profile:
+        click.echo("\n" + profiler.format_table(), err=True, nl=False)
+
+    if trace:
+        with open(trace, "w") as fd:
+            profiler.dump_trace(fd)
 
 
 @click.group()
@@ -14,12 +355,65 @@ from .util import compile_issue_template, yaml
 @click.option(
     "--jira",
     default="jira",
-    help="Which jira config to use, refers to an entry in the services section.",
+    help="Which jira config to use, refers to an entry in the services section. Separate "
+    "multiple services with commas to run fromtemplate on all of them.",
+)
+@click.option(
+    "--all-services",
+    is_flag=True,
+    help="Run fromtemplate on every service with a url and token.",
+)
+@click.option(
+    "--refresh-cache",
+    is_flag=True,
+    help="Ignore cached metadata and fetch it again from Jira.",
+)
+@click.option(
+    "--server",
+    envvar="JIRABP_SERVER",
+    help="Send fromtemplate to a running jirabp serve at this socket path or http://host:port.",
+)
+@click.option(
+    "--profile", is_flag=True, help="Report where the time was spent on stderr."
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    help="Format of the --profile report.",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write a Chrome trace of the run to this file, e.g. for speedscope or Perfetto.",
 )
 @click.pass_context
-def main(ctx, debug, jira, config):
+def main(
+    ctx,
+    debug,
+    jira,
+    all_services,
+    config,
+    refresh_cache,
+    server,
+    profile,
+    profile_format,
+    trace,
+):
     ctx.ensure_object(dict)
 
+    if server and ctx.invoked_subcommand != "fromtemplate":
+        # JIRABP_SERVER is meant for fromtemplate, other commands keep running locally
+        if ctx.get_parameter_source("server") != click.core.ParameterSource.ENVIRONMENT:
+            raise click.UsageError("Only fromtemplate can be sent to a server")
+    elif server:
+        if all_services or "," in jira:
+            raise click.UsageError("--server runs fromtemplate on a single service")
+        if profile or trace:
+            raise click.UsageError("--profile and --trace can't be used with --server")
+        ctx.obj = BlueprintClient(server, jira)
+        return
+
     configpath = os.path.expanduser(config)
 
     # Check if the config file is locked to mode 600. Add a loophole in case it is being passed in
@@ -30,13 +424,44 @@ def main(ctx, debug, jira, config):
     ):
         raise click.ClickException(f"Credentials file {config} is not chmod 600")
 
-    with open(configpath) as fd:
-        config = yaml.load(fd)
+    profiler = Profiler(enabled=bool(profile or trace))
+    if profiler.enabled:
+        ctx.call_on_close(
+            lambda: report_profile(profiler, profile and profile_format, trace)
+        )
+
+    with profiler.span("load config", "phase"):
+        with open(configpath) as fd:
+            config = fast_yaml.load(fd)
 
     if not config:
         raise click.ClickException(f"Could not load config file {configpath}")
 
-    ctx.obj = JiraBlueprint(config, jira, debug)
+    # Running on a service twice would create every issue twice
+    services = list(
+        dict.fromkeys(jira_services(config) if all_services else jira.split(","))
+    )
+    if not services:
+        raise click.UsageError(
+            "No services selected, --all-services needs services with a url and token"
+        )
+    for service in services:
+        if service not in config["services"]:
+            raise click.UsageError(
+                f"There is no {service} entry in the services section"
+            )
+
+    if len(services) == 1:
+        ctx.obj = JiraBlueprint(config, services[0], debug, refresh_cache, profiler)
+    elif ctx.invoked_subcommand != "fromtemplate":
+        raise click.UsageError("Only fromtemplate can run on multiple services")
+    else:
+        ctx.obj = ServiceFanout(
+            [
+                JiraBlueprint(config, service, debug, refresh_cache, profiler)
+                for service in services
+            ]
+        )
 
 
 @main.command()
@@ -59,11 +484,13 @@ def fieldmeta(ctx, fieldname):
 
     Show field metadata for the field FIELDNAME (either by id or name).
     """
-    all_fields = ctx.jira.fields()
+    try:
+        foundfield = ctx.fields.by_id[ctx.fields.resolve(fieldname)]
+    except KeyError:
+        foundfield = None
+    except AmbiguousFieldError as e:
+        foundfield = [ctx.fields.by_id[fieldid] for fieldid in e.ids]
 
-    foundfield = next(
-        (x for x in all_fields if x["id"] == fieldname or x["name"] == fieldname), None
-    )
     click.echo(json.dumps(foundfield, indent=2))
 
 
@@ -78,6 +505,49 @@ def issue(ctx, issue):
     click.echo(json.dumps(ctx.jira.issue(issue).raw["fields"], indent=2))
 
 
+@main.command()
+@click.argument("issue")
+@click.option("-n", "--name", help="Name of the template, defaults to the issue key")
+@click.option(
+    "-F",
+    "--field",
+    "fields",
+    multiple=True,
+    help="Export this field (id or name) instead of the default set, can be repeated",
+)
+@click.option(
+    "-o", "--output", type=click.File("w"), default="-", help="Write the template here"
+)
+@click.pass_obj
+def export(ctx, issue, name, fields, output):
+    """Export an issue and everything below it as a template.
+
+    Walks the children of ISSUE level by level and writes a template YAML that recreates the same
+    tree. By default the summary, issue type, description, labels, priority and components are
+    exported, fields are named as they would be written in a template.
+    """
+    from .export import TreeExporter
+
+    try:
+        exporter = TreeExporter(ctx, fields)
+    except AmbiguousFieldError as e:
+        raise click.UsageError(str(e)) from e
+    except KeyError as e:
+        raise click.UsageError(f"{e.args[0]} is not a valid field id or name") from e
+
+    with ctx.profiler.span("export", "phase"):
+        issues = run_reporting_errors(ctx, exporter.export, issue)
+
+    yaml.dump({name or issue.lower(): {"issues": issues}}, output)
+    click.echo(f"Exported {exporter.count} issues from {issue}", err=True)
+    if exporter.skipped:
+        click.echo(
+            "Skipped values that can't be expressed in a template for: "
+            + ", ".join(sorted(exporter.skipped)),
+            err=True,
+        )
+
+
 @main.command()
 @click.pass_obj
 @click.argument("project")
@@ -106,10 +576,79 @@ def createmeta(ctx, project, issuetype):
 @click.option(
     "-e", "--edit", is_flag=True, help="Revise the template before creating issues"
 )
+@click.option(
+    "-b",
+    "--bulk",
+    is_flag=True,
+    help="Create issues level by level using Jira's bulk create endpoint",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Create independent subtrees concurrently using this many workers",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Render each issue right before it is created instead of validating all up front",
+)
+@click.option(
+    "-k",
+    "--key",
+    help="Idempotency key of this instance, e.g. release-1.0. Issues already created with it are skipped",
+)
+@click.option(
+    "--plan-out",
+    type=click.File("w"),
+    help="Render and validate the issues into a plan file instead of creating them",
+)
+@click.option(
+    "--apply",
+    "apply_plan",
+    type=click.File("r"),
+    help="Create the issues from a plan file written with --plan-out",
+)
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False),
+    help="Record created issues in this journal file, defaults to one in the cache directory",
+)
+@click.option(
+    "--resume",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Continue an interrupted run, skipping issues recorded in this journal file",
+)
+@click.option(
+    "--args-file",
+    type=click.Path(exists=True, dir_okay=False, allow_dash=True),
+    help="Create one instance of the template per row of this CSV or JSON lines file",
+)
 @click.argument("template_name", required=False)
 @click.argument("args", nargs=-1)
 @click.pass_obj
-def fromtemplate(ctx, fname, template_name, args, parent, dry, verbose, assignee, edit):
+def fromtemplate(
+    ctx,
+    fname,
+    template_name,
+    args,
+    parent,
+    dry,
+    verbose,
+    assignee,
+    edit,
+    bulk,
+    jobs,
+    plan_out,
+    apply_plan,
+    journal_path,
+    resume,
+    args_file,
+    stream,
+    key,
+):
     """Create a set of issues from a YAML template.
 
     This command will create any number of issues from your template YAML file TEMPLATE_NAME. You
@@ -117,61 +656,87 @@ def fromtemplate(ctx, fname, template_name, args, parent, dry, verbose, assignee
     apply just a subset of the issues, the --edit option will allow you to edit a copy of the
     template before it is used.
 
+    Issues are rendered and validated before anything is created. The rendered plan can be saved
+    with --plan-out, reviewed, and later created with --apply. For very large templates, --stream
+    renders each issue only right before it is created, keeping memory use low.
+
+    To create many instances of a template at once, pass --args-file with a CSV file (with a header
+    row of argument names) or a JSON lines file of objects. ARGS apply to all rows as defaults.
+
+    Created issues are recorded in a journal. If a run is interrupted, run the same command again
+    with --resume JOURNAL to create only the missing issues.
+
+    With an idempotency key, from --key or the template's key setting, created issues are labelled
+    so running the same instance again only creates the issues that don't exist yet.
+
+    When multiple services are selected with --jira or --all-services, the template is created on
+    all of them concurrently and the results are reported per service.
+
     It is recommended to set the template file path in your configuration file.
     """
-    template_path = fname or ctx.toolconfig.get(
-        "templates", ctx.toolconfig.get("template_file", None)
-    )
-
-    if not template_path:
-        raise click.UsageError(
-            "You need to either pass -f or set a template_file in the tool config"
+    if isinstance(ctx, BlueprintClient):
+        fromtemplate_remote(
+            ctx,
+            fname,
+            template_name,
+            args,
+            parent=parent,
+            dry=dry,
+            verbose=verbose,
+            assignee=assignee,
+            edit=edit,
+            bulk=bulk,
+            jobs=jobs,
+            plan_out=plan_out,
+            apply_plan=apply_plan,
+            journal_path=journal_path,
+            resume=resume,
+            args_file=args_file,
+            stream=stream,
+            key=key,
         )
+        return
 
-    template_path = os.path.expanduser(template_path)
-
-    if os.path.isdir(template_path):
-        templates = {}
-        for path in os.listdir(template_path):
-            if path.endswith(".yaml"):
-                with open(os.path.join(template_path, path)) as fd:
-                    thisyaml = yaml.load(fd)
-                    duplicates = thisyaml.keys() & templates.keys()
-                    if duplicates:
-                        raise click.UsageError(
-                            f"Duplicate template names in {path}: {','.join(duplicates)}"
-                        )
-                    templates.update(thisyaml)
+    fanout = None
+    if isinstance(ctx, ServiceFanout):
+        if apply_plan or plan_out or journal_path or resume or args_file:
+            raise click.UsageError(
+                "--apply, --plan-out, --journal, --resume and --args-file can't be used with "
+                "multiple services"
+            )
+        fanout, ctx = ctx, ctx.primary
 
-    else:
-        with open(template_path) as fd:
-            templates = yaml.load(fd)
+    if stream and (plan_out or apply_plan):
+        raise click.UsageError("--stream can't be combined with --plan-out or --apply")
 
-    # No template specified, list them for usage
-    if not template_name:
-        if verbose:
-            print("Args starting with ? are optional\n")
-        for key, template in templates.items():
-            args = ""
-            for arg, data in template.get("args", {}).items():
-                args += f" {arg}=" + ("required" if data["required"] else "optional")
-            print(f"jirabp fromtemplate {key:20} {args}")
-
-            if verbose:
-                for arg, data in template.get("args", {}).items():
-                    argname = "?" if not data.get("required", False) else "" + arg
-                    print(f"\t{argname:>40}: {data['description']}")
+    if apply_plan:
+        if template_name:
+            raise click.UsageError("--apply can't be combined with a template name")
 
+        try:
+            plan = Plan.load(apply_plan)
+        except (ValueError, KeyError) as e:
+            raise click.UsageError(f"Invalid plan file {apply_plan.name}: {e}") from e
+
+        if plan.service != ctx.jiraname:
+            raise click.UsageError(
+                f"Plan was made for the {plan.service} service, not {ctx.jiraname}"
+            )
+
+        apply_journaled(ctx, plan, journal_path, resume, dry=dry, bulk=bulk, jobs=jobs)
         return
 
-    if template_name not in templates:
-        raise click.BadArgumentUsage(
-            f"Could not find template {template_name} in {template_path}"
-        )
+    catalog = template_catalog(ctx, fname)
+
+    # No template specified, list them for usage
+    if not template_name:
+        print_templates(catalog.templates(), verbose)
+        return
 
-    template = templates[template_name]
+    template = load_template(ctx, catalog, template_name)
 
     if edit or template.get("edit", False):
+        template = catalog.load_roundtrip(template_name)
         template.pop("edit", None)
 
         content = yaml.dump(template)
@@ -181,7 +746,7 @@ def fromtemplate(ctx, fname, template_name, args, parent, dry, verbose, assignee
                 return
 
             try:
-                template = yaml.load(content)
+                template = fast_yaml.load(content)
                 break
             except Exception as e:
                 content = (
@@ -190,29 +755,117 @@ def fromtemplate(ctx, fname, template_name, args, parent, dry, verbose, assignee
 
     supplied_args = dict(kv.split("=", 1) for kv in args)
 
-    if "args" in template:
-        for arg, argdata in template["args"].items():
-            if arg not in supplied_args and argdata.get("required", False):
-                raise click.BadArgumentUsage(
-                    f"Missing argument '{arg}' ({argdata['description']})"
-                )
+    if fanout:
+        check_required_args(template, supplied_args)
+        fanout.run(
+            lambda blueprint: create_from_template(
+                blueprint,
+                template,
+                template_name,
+                supplied_args,
+                parent=parent,
+                # Account ids differ between instances, each has its own usermap
+                assignee=resolve_assignee(blueprint, assignee),
+                dry=dry,
+                bulk=bulk,
+                jobs=jobs,
+                stream=stream,
+                key=key,
+            )
+        )
+        return
+
+    assignee = resolve_assignee(ctx, assignee)
 
-    if assignee:
-        usermap = ctx.toolconfig.get("usermap", {}).get(ctx.jiraname, {})
-        if assignee not in usermap:
-            raise click.UsageError(f"Missing {assignee} in config's usermap")
+    if args_file:
+        if plan_out or journal_path or resume:
+            raise click.UsageError(
+                "--args-file can't be combined with --plan-out, --journal or --resume"
+            )
+        instantiate_rows(
+            ctx,
+            template,
+            template_name,
+            supplied_args,
+            args_file,
+            parent=parent,
+            assignee=assignee,
+            dry=dry,
+            bulk=bulk,
+            jobs=jobs,
+            stream=stream,
+            key=key,
+        )
+        return
 
-        assignee = usermap[assignee]
+    check_required_args(template, supplied_args)
 
-    try:
-        ctx.process_issues(
-            template["issues"], supplied_args, parent=parent, dry=dry, assignee=assignee
+    plan = run_reporting_errors(
+        ctx,
+        ctx.stream_plan if stream else ctx.plan_issues,
+        template["issues"],
+        supplied_args,
+        parent=parent,
+        assignee=assignee,
+        template=template_name,
+        key=instance_key(ctx, template, key, supplied_args),
+    )
+
+    if plan_out:
+        plan.dump(plan_out)
+        click.echo(f"Wrote plan for {len(plan)} issues to {plan_out.name}")
+        return
+
+    apply_journaled(ctx, plan, journal_path, resume, dry=dry, bulk=bulk, jobs=jobs)
+
+
+@main.command()
+@click.option("-f", "--file", "fname", help="Template yaml file to load from")
+@click.option(
+    "-i",
+    "--instance",
+    help="Idempotency key the issues were created with, defaults to the template's key",
+)
+@click.option("-n", "--dry", is_flag=True, help="Only show what would be updated")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Update issues concurrently using this many workers",
+)
+@click.argument("template_name")
+@click.argument("args", nargs=-1)
+@click.pass_obj
+def sync(ctx, fname, instance, dry, jobs, template_name, args):
+    """Update the issues of an instance to match its template.
+
+    Finds the issues created from TEMPLATE_NAME with an idempotency key, renders the template with
+    ARGS again and updates only the fields that changed. Issue types, sprints and the parent of
+    the top level issues are left alone. Issues missing from the instance are reported, they can be
+    created by running fromtemplate with the same key.
+    """
+    from .sync import InstanceSync
+
+    template = load_template(ctx, template_catalog(ctx, fname), template_name)
+    supplied_args = dict(kv.split("=", 1) for kv in args)
+    check_required_args(template, supplied_args)
+
+    key = instance_key(ctx, template, instance, supplied_args)
+    if not key:
+        raise click.UsageError(
+            f"Pass --instance or set a key in the {template_name} template"
         )
-    except Exception as e:
-        if ctx.debug:
-            raise
-        else:
-            raise click.ClickException(f"{e}:\n\t{e.__cause__}") from e
+
+    plan = run_reporting_errors(
+        ctx,
+        ctx.plan_issues,
+        template["issues"],
+        supplied_args,
+        template=template_name,
+        key=key,
+    )
+    run_reporting_errors(ctx, InstanceSync(ctx, key).sync, plan, dry=dry, jobs=jobs)
 
 
 @main.command()
@@ -236,11 +889,7 @@ def create(ctx, issuetype, project):
     issuetype = issuetype[0].upper() + issuetype[1:]
     project = project or ctx.defaultfield("project")
     pinned = ctx.toolconfig.get("pinned", [])
-    meta = ctx.jira.createmeta(
-        projectKeys=project,
-        issuetypeNames=issuetype,
-        expand="projects.issuetypes.fields",
-    )
+    meta = ctx.createmeta(project, issuetype)
 
     issuetypemeta = next(
         (x for x in meta["projects"][0]["issuetypes"] if x["name"] == issuetype), None
@@ -256,7 +905,7 @@ def create(ctx, issuetype, project):
             return
         error = None
 
-        templatedata = yaml.load(template)
+        templatedata = fast_yaml.load(template)
         issuetemplate = templatedata[issuetype.lower()]
 
         finaldata = {}
@@ -273,5 +922,116 @@ def create(ctx, issuetype, project):
             error = "# Exception: " + "\n# ".join(str(e).split("\n")) + "\n"
 
 
+@main.group()
+def cache():
+    """Manage the cached Jira metadata.
+
+    Fields, create metadata and sprints are cached on disk per service, so they don't have to be
+    fetched on every invocation. Time to live can be configured in the cache section of the tool
+    config.
+    """
+
+
+@cache.command("show")
+@click.pass_obj
+def cache_show(ctx):
+    """Show the cache entries for this service."""
+    click.echo(f"Cache directory: {ctx.cache.directory}")
+    for name, kind, fetched, size, fresh in ctx.cache.entries():
+        age = f"{time.time() - fetched:8.0f}s" if fetched else "unknown"
+        status = "fresh" if fresh else "stale"
+        click.echo(
+            f"{name:40} {age:>10} {status:6} {size:>10} bytes  (ttl {ctx.cache.ttls.get(kind, 0)}s)"
+        )
+
+
+@cache.command("clear")
+@click.argument("kind", required=False, type=click.Choice(sorted(DEFAULT_TTLS)))
+@click.pass_obj
+def cache_clear(ctx, kind):
+    """Remove cached metadata, optionally only of the given KIND."""
+    removed = ctx.cache.clear(kind)
+    click.echo(f"Removed {removed} cache entries")
+
+
+@cache.command("warm")
+@click.option(
+    "-b",
+    "--board",
+    "boards",
+    multiple=True,
+    type=int,
+    help="Also fetch sprints for board",
+)
+@click.option(
+    "-t",
+    "--issuetype",
+    "issuetypes",
+    multiple=True,
+    help="Also fetch create metadata for this issue type in the default project",
+)
+@click.pass_obj
+def cache_warm(ctx, boards, issuetypes):
+    """Fetch metadata into the cache ahead of time."""
+    ctx.cache.refresh = True
+
+    click.echo(f"Fetched {len(ctx.fields)} fields")
+
+    if ctx.defaultfield("board"):
+        boards = (None,) + boards
+    for board in boards:
+        sprints = ctx.get_sprints(board)
+        click.echo(
+            f"Fetched {len(sprints)} sprints for board {board or ctx.defaultfield('board')}"
+        )
+
+    project = ctx.defaultfield("project")
+    for issuetype in issuetypes:
+        ctx.createmeta(project, issuetype[0].upper() + issuetype[1:])
+        click.echo(f"Fetched create metadata for {issuetype} in {project}")
+
+
+@main.command()
+@click.option("-f", "--file", "fname", help="Template yaml file or directory to serve")
+@click.option(
+    "-l",
+    "--listen",
+    help="Unix socket path or http://host:port to listen on, defaults to server.sock in the cache",
+)
+@click.option(
+    "--refresh",
+    type=click.IntRange(min=0),
+    help="Refresh the cached metadata every this many seconds, 0 to disable",
+)
+@click.option(
+    "--queue",
+    "queuesize",
+    type=click.IntRange(min=1),
+    help="Maximum number of requests waiting to be handled",
+)
+@click.pass_obj
+def serve(ctx, fname, listen, refresh, queuesize):
+    """Keep a warm instance running for fast repeated use.
+
+    Serves template listing, plan and apply over a local Unix socket (or HTTP), with the Jira
+    client, connection pool and metadata caches kept warm. Requests are handled one at a time in
+    the order they arrive. Use jirabp --server ADDRESS fromtemplate ... to send commands to it.
+    """
+    from .server import DEFAULT_SERVER, BlueprintServer
+
+    config = {**DEFAULT_SERVER, **ctx.toolconfig.get("server", {})}
+    listen = (
+        listen or config["listen"] or os.path.join(ctx.cache.directory, "server.sock")
+    )
+
+    server = BlueprintServer(
+        ctx,
+        templates=fname,
+        refresh=config["refresh"] if refresh is None else refresh,
+        queuesize=queuesize or config["queue"],
+    )
+    server.serve(listen)
+
+
 if __name__ == "__main__":
     main(prog_name="jirabp")
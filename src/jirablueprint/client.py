@@ -0,0 +1,87 @@
+import json
+import os
+import socket
+from urllib.parse import urlencode
+
+import click
+
+
+def parse_address(address):
+    """Return (host, port) for an http://host:port address, otherwise the Unix socket path."""
+    if address.startswith("http://"):
+        host, _, port = address[len("http://") :].rstrip("/").rpartition(":")
+        try:
+            return host or "localhost", int(port)
+        except ValueError:
+            raise click.UsageError(f"Invalid server address {address}") from None
+
+    return os.path.abspath(os.path.expanduser(address))
+
+
+class BlueprintClient:
+    """Thin client for a jirabp serve process.
+
+    Only the standard library's HTTP client is used, so commands sent to the server don't need
+    to load the config, the Jira client or the templates.
+    """
+
+    def __init__(self, address, service):
+        self.address = address
+        # The service selected with --jira, sent along so the server can refuse to run it on
+        # another one
+        self.service = service
+        self._target = parse_address(address)
+
+    def _connection(self):
+        import http.client
+
+        if isinstance(self._target, tuple):
+            return http.client.HTTPConnection(*self._target)
+
+        connection = http.client.HTTPConnection("localhost")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self._target)
+        except OSError:
+            sock.close()
+            raise
+        connection.sock = sock
+        return connection
+
+    def request(self, method, path, body=None, **params):
+        """Send a request to the server, echo its output and return the result."""
+        if params:
+            path += "?" + urlencode(
+                {key: value for key, value in params.items() if value is not None}
+            )
+
+        connection = None
+        try:
+            connection = self._connection()
+            connection.request(
+                method,
+                path,
+                body=json.dumps(body) if body is not None else None,
+                headers={"Content-Type": "application/json"},
+            )
+            response = connection.getresponse()
+            data = json.loads(response.read())
+        except (OSError, ValueError) as e:
+            raise click.ClickException(
+                f"Could not talk to the jirabp server at {self.address}: {e}"
+            ) from e
+        finally:
+            if connection:
+                connection.close()
+
+        if data.get("output"):
+            click.echo(data["output"], nl=False)
+
+        if response.status == 400:
+            raise click.UsageError(data.get("error"))
+        elif response.status != 200:
+            raise click.ClickException(
+                data.get("error") or f"Server responded with status {response.status}"
+            )
+
+        return data["result"]
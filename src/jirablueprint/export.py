@@ -0,0 +1,150 @@
+from ruamel.yaml.scalarstring import LiteralScalarString
+
+from .jirablueprint import GH_SPRINT, TEMPLATE_MARKERS
+from .plan import INSTANCE_LABEL_PREFIX
+
+# Fields exported unless others are requested. Parent and sprint are left out, the parent is the
+# structure of the template and sprints are better expressed relative to the active one.
+DEFAULT_EXPORT_FIELDS = [
+    "summary",
+    "issuetype",
+    "description",
+    "labels",
+    "priority",
+    "components",
+]
+
+# Number of issue keys in a single "parent in (...)" query, keeps the JQL well below URL limits
+PARENT_BATCH_SIZE = 50
+
+# Issues per search page
+SEARCH_PAGE_SIZE = 100
+
+
+def search_pages(jira, jql, fields, pagesize=SEARCH_PAGE_SIZE):
+    """Yield the raw issues matching jql, fetching one page at a time.
+
+    Jira Cloud only supports token based pagination, other deployments page by offset.
+    """
+    if jira.deploymentType == "Cloud":
+        token = None
+        while True:
+            page = jira.enhanced_search_issues(
+                jql,
+                nextPageToken=token,
+                maxResults=pagesize,
+                fields=fields,
+                json_result=True,
+            )
+            yield from page["issues"]
+            token = page.get("nextPageToken")
+            if not token or page.get("isLast", True):
+                return
+    else:
+        start = 0
+        while True:
+            page = jira.search_issues(
+                jql, startAt=start, maxResults=pagesize, fields=fields, json_result=True
+            )
+            yield from page["issues"]
+            start += len(page["issues"])
+            if not page["issues"] or start >= page["total"]:
+                return
+
+
+class TreeExporter:
+    """Turns an existing issue and everything below it into a blueprint template.
+
+    The tree is fetched level by level, with the children of up to PARENT_BATCH_SIZE issues per
+    paginated search. Each issue is converted to its template form as soon as its page arrives, so
+    only the template and the keys of the current level are kept in memory.
+    """
+
+    def __init__(self, blueprint, fields=None):
+        self.blueprint = blueprint
+        self.registry = blueprint.fields
+        self.fieldids = [
+            self.registry.resolve(field) for field in fields or DEFAULT_EXPORT_FIELDS
+        ]
+        self.skipped = set()
+        self.count = 0
+
+    def _field_name(self, fieldid):
+        # System fields are used by id in templates, custom fields by their name if it's unique
+        name = self.registry.names.get(fieldid, fieldid)
+        if fieldid.startswith("customfield_") and name not in self.registry.ambiguous:
+            return name
+        return fieldid
+
+    def _value(self, fieldid, schema, value):
+        """The template value for a field value returned by Jira, reversing the translation."""
+        kind = schema.get("type")
+        if kind == "array" and isinstance(value, list):
+            if schema.get("custom") == GH_SPRINT:
+                raise ValueError("sprint")
+            return [
+                self._value(fieldid, {"type": schema["items"]}, item) for item in value
+            ]
+        elif kind in ("string", "date", "datetime", "option2", "any"):
+            if not isinstance(value, str):
+                raise ValueError(kind)
+            if TEMPLATE_MARKERS.search(value):
+                # Text that looks like a template must come out unchanged
+                value = "{% raw %}" + value + "{% endraw %}"
+            return LiteralScalarString(value) if "\n" in value else value
+        elif kind == "number":
+            return int(value) if float(value).is_integer() else value
+        elif kind in ("issuetype", "status", "priority", "component"):
+            return value["name"]
+        elif kind == "user":
+            return value["accountId"]
+        elif kind == "option":
+            return value["value"]
+        raise ValueError(kind)
+
+    def _node(self, raw):
+        self.count += 1
+        fields = {}
+        for fieldid in self.fieldids:
+            value = raw["fields"].get(fieldid)
+            if fieldid == "labels" and value:
+                # Idempotency key labels belong to the exported instance, not the template
+                value = [
+                    label
+                    for label in value
+                    if not label.startswith(INSTANCE_LABEL_PREFIX)
+                ]
+            if value in (None, [], ""):
+                continue
+            try:
+                fields[self._field_name(fieldid)] = self._value(
+                    fieldid, self.registry.schema(fieldid), value
+                )
+            except (ValueError, KeyError, TypeError):
+                self.skipped.add(self.registry.names.get(fieldid, fieldid))
+        return {"fields": fields}
+
+    def export(self, key):
+        """Return the template issues for key and all issues below it."""
+        jira = self.blueprint.jira
+        fields = self.fieldids + ["parent"]
+
+        raw = jira.issue(key, fields=",".join(fields)).raw
+        root = self._node(raw)
+        level = {raw["key"]: root}
+        while level:
+            nextlevel = {}
+            keys = list(level)
+            for start in range(0, len(keys), PARENT_BATCH_SIZE):
+                jql = (
+                    f"parent in ({','.join(keys[start : start + PARENT_BATCH_SIZE])})"
+                    " ORDER BY created ASC"
+                )
+                for raw in search_pages(self.blueprint.search_client, jql, fields):
+                    node = self._node(raw)
+                    parent = level[raw["fields"]["parent"]["key"]]
+                    parent.setdefault("children", []).append(node)
+                    nextlevel[raw["key"]] = node
+            level = nextlevel
+
+        return [root]
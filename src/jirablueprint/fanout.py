@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+
+
+def jira_services(config):
+    """Names of all services in config that are set up like a Jira instance."""
+    return [
+        name
+        for name, service in config["services"].items()
+        if isinstance(service, dict) and "url" in service and "token" in service
+    ]
+
+
+class ServiceFanout:
+    """The JiraBlueprint instances of several services, to run the same command on each of them.
+
+    Every service keeps its own client, fields, sprints and usermap. Services run concurrently,
+    each one printing into its own buffer that is shown as soon as that service is done, so a slow
+    instance doesn't hold up the output of the others.
+    """
+
+    def __init__(self, blueprints):
+        self.blueprints = blueprints
+
+    @property
+    def primary(self):
+        """The first service, used for what is shared like the template catalog."""
+        return self.blueprints[0]
+
+    def run(self, func):
+        """Call func(blueprint) for every service and report the results per service.
+
+        func returns a short summary of what it did. Raises a ClickException if any service
+        failed, after all of them are done.
+        """
+        for blueprint in self.blueprints:
+            blueprint.console = blueprint.console.buffered()
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(self.blueprints)) as pool:
+            futures = {
+                pool.submit(func, blueprint): blueprint for blueprint in self.blueprints
+            }
+            for future in as_completed(futures):
+                blueprint = futures[future]
+                click.echo(f"== {blueprint.jiraname}")
+                blueprint.console.flush()
+                try:
+                    results[blueprint.jiraname] = (True, future.result())
+                except click.ClickException as e:
+                    click.echo(f"Error: {e.format_message()}", err=True)
+                    results[blueprint.jiraname] = (
+                        False,
+                        e.format_message().split("\n")[0],
+                    )
+
+        click.echo("\nResults:")
+        for blueprint in self.blueprints:
+            success, message = results[blueprint.jiraname]
+            click.echo(
+                f"  {blueprint.jiraname:20} {'ok' if success else 'FAILED':6} {message}"
+            )
+
+        failed = sum(1 for success, _ in results.values() if not success)
+        if failed:
+            raise click.ClickException(f"{failed} of {len(results)} services failed")
@@ -0,0 +1,73 @@
+class AmbiguousFieldError(LookupError):
+    def __init__(self, name, ids):
+        super().__init__(name, ids)
+        self.name = name
+        self.ids = ids
+
+    def __str__(self):
+        return (
+            f"'{self.name}' is ambiguous, use one of the field ids instead: "
+            + ", ".join(self.ids)
+        )
+
+
+class FieldRegistry:
+    """All lookups for the fields of a Jira instance, built from a single fields() response."""
+
+    def __init__(self, all_fields):
+        self.by_id = {}
+        self.names = {}
+        self.ids_by_name = {}
+        self._ids_by_lower_name = {}
+
+        ids_for_name = {}
+        for field in all_fields:
+            self.by_id[field["id"]] = field
+            self.names[field["id"]] = field["name"]
+            self.ids_by_name[field["name"]] = field["id"]
+            ids_for_name.setdefault(field["name"], []).append(field["id"])
+            self._ids_by_lower_name.setdefault(field["name"].lower(), []).append(
+                field["id"]
+            )
+
+        # Names shared by more than one field, e.g. multiple "Checklist" fields where some are
+        # read-only. These can only be referred to by id.
+        self.ambiguous = {
+            name: ids for name, ids in ids_for_name.items() if len(ids) > 1
+        }
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def clause_ids(self):
+        """Field ids by JQL clause name, like the Jira client builds them for its searches."""
+        return {
+            name: field["id"]
+            for field in self.by_id.values()
+            for name in field.get("clauseNames", [])
+        }
+
+    def schema(self, fieldid):
+        return self.by_id[fieldid].get("schema", {"type": "any"})
+
+    def resolve(self, key):
+        """Return the field id for a field id or name, falling back to a case-insensitive match.
+
+        Raises KeyError if there is no such field, or AmbiguousFieldError if the name matches
+        more than one field.
+        """
+        if key in self.by_id:
+            return key
+
+        if key in self.ids_by_name:
+            ids = self.ambiguous.get(key)
+            if ids:
+                raise AmbiguousFieldError(key, ids)
+            return self.ids_by_name[key]
+
+        ids = self._ids_by_lower_name.get(key.lower())
+        if not ids:
+            raise KeyError(key)
+        elif len(ids) > 1:
+            raise AmbiguousFieldError(key, ids)
+        return ids[0]
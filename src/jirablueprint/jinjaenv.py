@@ -14,26 +14,15 @@ class JiraBlueprintEnvironment(Environment):
         self.globals["relative_sprints"] = self.relative_sprints
         self.globals["active_sprint"] = self.active_sprint
 
-    def _format_sprint_date(self, datestr):
-        return datetime.strptime(datestr, "%Y-%m-%dT%H:%M:%S.%fZ")
-
-    # There are certainly smarter ways to cache/lookup the sprints, but this works (tm)
-    def _find_sprint_by_date(self, target_date, board=None):
-        for sprint in self.jirabp.get_sprints(board):
-            if sprint.startDate and sprint.endDate:
-                start_date = self._format_sprint_date(sprint.startDate)
-                end_date = self._format_sprint_date(sprint.endDate)
-                if start_date <= target_date <= end_date:
-                    return sprint
-        return None
-
     @type_enforced.Enforcer
     def relative_weeks(self, datestr: str, weeks: int) -> str:
         return str(date.fromisoformat(datestr) + timedelta(weeks=weeks))
 
     @type_enforced.Enforcer
     def sprint_for_date(self, datestr: str, board: [int, None] = None) -> str:
-        sprint = self._find_sprint_by_date(datetime.fromisoformat(datestr), board)
+        sprint = self.jirabp.get_sprint_index(board).find_by_date(
+            datetime.fromisoformat(datestr)
+        )
         if not sprint:
             raise Exception("No active/future sprint found at " + datestr)
 
@@ -41,10 +30,10 @@ class JiraBlueprintEnvironment(Environment):
 
     @type_enforced.Enforcer
     def active_sprint(self, board: [int, None] = None) -> str:
-        for sprint in self.jirabp.get_sprints(board):
-            if sprint.state == "active":
-                return sprint.name
-        raise Exception(f"No active sprint on board {board}")
+        sprint = self.jirabp.get_sprint_index(board).active
+        if not sprint:
+            raise Exception(f"No active sprint on board {board}")
+        return sprint.name
 
     @type_enforced.Enforcer
     def relative_sprints(
@@ -53,25 +42,14 @@ class JiraBlueprintEnvironment(Environment):
         if sprints == 0:
             return sprintstr
 
-        sprint = self.jirabp.get_sprint_name_dict(board).get(sprintstr)
-        if not sprint:
+        index = self.jirabp.get_sprint_index(board)
+        if sprintstr not in index.by_name:
             raise Exception(f"Could not find active/future sprint {sprintstr}")
 
-        if sprints > 0:
-            end_date = self._format_sprint_date(sprint.endDate)
-            new_sprint = self._find_sprint_by_date(end_date + timedelta(days=3), board)
-            if not new_sprint:
-                raise Exception(
-                    f"Could not find active/future sprint after {sprintstr}"
-                )
-            return self.relative_sprints(new_sprint.name, sprints - 1, board)
-        else:
-            start_date = self._format_sprint_date(sprint.startDate)
-            new_sprint = self._find_sprint_by_date(
-                start_date - timedelta(days=3), board
+        new_sprint = index.relative(sprintstr, sprints)
+        if not new_sprint:
+            direction = "after" if sprints > 0 else "before"
+            raise Exception(
+                f"Could not find active/future sprint {direction} {sprintstr}"
             )
-            if not new_sprint:
-                raise Exception(
-                    f"Could not find active/future sprint before {sprintstr}"
-                )
-            return self.relative_sprints(new_sprint.name, sprints + 1, board)
+        return new_sprint.name
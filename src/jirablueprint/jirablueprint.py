@@ -1,24 +1,49 @@
-import http.client
 import json
 import logging
-from collections.abc import MutableSequence
+import re
+from collections.abc import Iterable, MutableSequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from functools import cached_property, lru_cache
 
 import click
-from jira import JIRA
 
-from .jinjaenv import JiraBlueprintEnvironment
+from .cache import MetadataCache
+from .fields import AmbiguousFieldError, FieldRegistry
+from .links import LINK_CHUNK_SIZE, LINK_JOBS
+from .plan import (
+    ApplyRun,
+    Plan,
+    PlanNode,
+    StreamingPlan,
+    instance_label,
+    node_label,
+    node_label_path,
+    walk_issues,
+)
+from .profiling import Profiler
+from .sprints import SPRINT_ADD_LIMIT, CachedSprint, SprintIndex
 from .util import ConsolePrinter
 
+# Maximum number of issues Jira accepts in a single POST /issue/bulk request
+BULK_CREATE_LIMIT = 50
+
+# Number of compiled Jinja templates to keep around, keyed by their source
+TEMPLATE_CACHE_SIZE = 1024
+
+# Strings without any of these don't need to go through Jinja. Carriage returns are included since
+# Jinja normalizes newlines.
+TEMPLATE_MARKERS = re.compile(r"\{[{%#]|\r")
+
+# Custom type of the agile sprint field
+GH_SPRINT = "com.pyxis.greenhopper.jira:gh-sprint"
+
 
 class JiraBlueprint:
-    def __init__(self, config, jira="jira", debug=False):
-        jconfig = config["services"][jira]
+    def __init__(
+        self, config, jira="jira", debug=False, refresh_cache=False, profiler=None
+    ):
         self.jiraname = jira
-        self.jira = JIRA(
-            jconfig["url"],
-            basic_auth=(jconfig["username"], jconfig["token"]),
-        )
+        self.jconfig = config["services"][jira]
 
         self.toolconfig = (
             config["tools"]["jirablueprint"]
@@ -26,11 +51,22 @@ class JiraBlueprint:
             else {}
         )
         self.serviceconfig = config["services"]
+        self.cache = MetadataCache(
+            jira, self.toolconfig.get("cache", {}), refresh=refresh_cache
+        )
         self.debug = debug
         self.console = ConsolePrinter(debug)
-        self.tenv = JiraBlueprintEnvironment(self)
+        self.profiler = profiler or Profiler(enabled=False)
+
+        # Boards and issue types metadata was requested for, see refresh_metadata()
+        self._boards = set()
+        self._issuetypes = set()
+        # Compiled value translators by field id, see translator()
+        self._translators = {}
 
         if debug:
+            import http.client
+
             logging.basicConfig()
             logging.getLogger().setLevel(logging.DEBUG)
             requests_log = logging.getLogger("requests.packages.urllib3")
@@ -38,20 +74,75 @@ class JiraBlueprint:
             requests_log.propagate = True
             http.client.HTTPConnection.debuglevel = 1
 
+    # The Jira client and the template environment pull in a lot of modules, and constructing the
+    # client already talks to the server. Commands that only need the templates or cached metadata
+    # should not pay for either, so they are created on first use.
+
     @cached_property
-    def full_fields_map(self):
-        all_fields = self.jira.fields()
-        return {field["id"]: field for field in all_fields}
+    def jira(self):
+        from jira import JIRA
+
+        from .transport import configure_session, transport_config
+
+        # Retries are handled by our adapter, which also knows about rate limits
+        transport = transport_config(self.jconfig)
+        with self.profiler.span("connect", "phase"):
+            client = JIRA(
+                self.jconfig["url"],
+                basic_auth=(self.jconfig["username"], self.jconfig["token"]),
+                max_retries=0,
+                timeout=transport["timeout"],
+                get_server_info=False,
+            )
+            configure_session(client._session, transport, self.profiler)
+
+            # The constructor would fetch the server info before the adapter is mounted, without
+            # retries. The client picks its API calls based on the version and deployment type.
+            info = client.server_info()
+            client._version = tuple(info["versionNumbers"])
+            client.deploymentType = info.get("deploymentType")
+        return client
 
     @cached_property
-    def fields_map(self):
-        all_fields = self.jira.fields()
-        return {field["id"]: field["name"] for field in all_fields}
+    def search_client(self):
+        """The Jira client, prepared for searches that request specific fields.
+
+        The client translates the requested fields through its own map of all fields, which it
+        downloads on the first search. Seeding that map from the cached fields saves the request.
+        """
+        self.jira._fields_cache_value = self.fields.clause_ids()
+        return self.jira
+
+    @cached_property
+    def tenv(self):
+        from .jinjaenv import JiraBlueprintEnvironment
+
+        return JiraBlueprintEnvironment(self)
 
     @cached_property
+    def fields(self):
+        with self.profiler.span("fields", "metadata"):
+            return FieldRegistry(self.cache.get("fields", lambda: self.jira.fields()))
+
+    @cached_property
+    def link_types(self):
+        with self.profiler.span("link types", "metadata"):
+            return self.cache.get(
+                "linktypes",
+                lambda: [linktype.raw for linktype in self.jira.issue_link_types()],
+            )
+
+    @property
+    def full_fields_map(self):
+        return self.fields.by_id
+
+    @property
+    def fields_map(self):
+        return self.fields.names
+
+    @property
     def rev_fields_map(self):
-        all_fields = self.jira.fields()
-        return {field["name"]: field["id"] for field in all_fields}
+        return self.fields.ids_by_name
 
     def defaultfield(self, name, default=None):
         if "defaults" not in self.toolconfig:
@@ -65,7 +156,32 @@ class JiraBlueprint:
             board = self.defaultfield("board")
             if not board:
                 raise Exception("No default board specified in config")
-        return self.jira.sprints(board, state="active,future")
+
+        self._boards.add(board)
+        with self.profiler.span(f"sprints {board}", "metadata"):
+            sprints = self.cache.get(
+                "sprints",
+                lambda: [
+                    sprint.raw
+                    for sprint in self.jira.sprints(board, state="active,future")
+                ],
+                key=board,
+            )
+            return [CachedSprint(raw) for raw in sprints]
+
+    @lru_cache(maxsize=None)
+    def createmeta(self, project, issuetype):
+        self._issuetypes.add((project, issuetype))
+        with self.profiler.span(f"createmeta {project} {issuetype}", "metadata"):
+            return self.cache.get(
+                "createmeta",
+                lambda: self.jira.createmeta(
+                    projectKeys=project,
+                    issuetypeNames=issuetype,
+                    expand="projects.issuetypes.fields",
+                ),
+                key=f"{project}-{issuetype}",
+            )
 
     @lru_cache(maxsize=None)
     def get_sprint_dict(self, board=None):
@@ -74,149 +190,735 @@ class JiraBlueprint:
 
     @lru_cache(maxsize=None)
     def get_sprint_name_dict(self, board=None):
-        sprints = self.get_sprints(board)
-        return {sprint.name: sprint for sprint in sprints}
+        return self.get_sprint_index(board).by_name
+
+    @lru_cache(maxsize=None)
+    def get_sprint_index(self, board=None):
+        return SprintIndex(self.get_sprints(board))
+
+    def refresh_metadata(self):
+        """Fetch the fields and all sprints and create metadata used so far again.
+
+        This keeps the metadata of a long running process current, regardless of its time to live.
+        """
+        for method in (
+            self.get_sprints,
+            self.createmeta,
+            self.get_sprint_dict,
+            self.get_sprint_name_dict,
+            self.get_sprint_index,
+        ):
+            method.cache_clear()
+        self.__dict__.pop("fields", None)
+        self.__dict__.pop("link_types", None)
+        self.__dict__.pop("search_client", None)
+        self._translators = {}
+
+        refresh, self.cache.refresh = self.cache.refresh, True
+        try:
+            self.fields
+            for board in list(self._boards):
+                self.get_sprints(board)
+            for project, issuetype in list(self._issuetypes):
+                self.createmeta(project, issuetype)
+        finally:
+            self.cache.refresh = refresh
+
+    @lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+    def _compile_template(self, source):
+        return self.tenv.from_string(source)
+
+    @lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+    def _compile_expression(self, source):
+        return self.tenv.compile_expression(source)
+
+    def _foreach_items(self, foreach, args):
+        if isinstance(foreach, str):
+            expression = foreach.strip()
+            if expression.startswith("{{") and expression.endswith("}}"):
+                expression = expression[2:-2]
+            foreach = self._compile_expression(expression)(**args)
+
+        if isinstance(foreach, (str, dict)) or not isinstance(foreach, Iterable):
+            raise Exception(f"foreach must be a list, not {foreach!r}")
+        return foreach
+
+    def siblings(self, issues, args, parentpath):
+        """Yield (path, issue, args) for a list of sibling issues in a template.
+
+        An issue with foreach is repeated for each item of a list or Jinja expression, with the
+        item available to it and its children as "item" or the name given in "as". Items are
+        produced one at a time, and get paths like "0.3-5" for the sixth item of the fourth child.
+        """
+        prefix = f"{parentpath}." if parentpath else ""
+        for idx, issue in enumerate(issues):
+            if "foreach" not in issue:
+                yield f"{prefix}{idx}", issue, args
+                continue
+
+            try:
+                items = self._foreach_items(issue["foreach"], args)
+            except Exception as e:
+                raise Exception(
+                    f"Error evaluating foreach '{issue['foreach']}' of {prefix}{idx}"
+                ) from e
+
+            name = issue.get("as", "item")
+            for itemidx, item in enumerate(items):
+                yield f"{prefix}{idx}-{itemidx}", issue, {**args, name: item}
 
     def _format_value(self, value, args):
-        return self.tenv.from_string(value).render(**args)
-
-    def _translate_type_value(self, key, schema, value, args):
-        if key == "parent":
-            return {"key": value}
-
-        if schema.get("custom", "") == "com.pyxis.greenhopper.jira:gh-sprint":
-            # Slight adjustment so we can deal with this as a standard array
-            schema["items"] = "com.pyxis.greenhopper.jira:gh-sprint"
-
-        if schema["type"] in ("string", "date", "datetime", "option2", "any"):
-            return self._format_value(value, args)
-        elif schema["type"] == "number":
-            return int(value)
-        elif schema["type"] in ("issuetype", "status", "priority", "component"):
-            return {"name": self._format_value(value, args)}
-        elif schema["type"] == "user":
-            return {"accountId": self._format_value(value, args)}
-        elif schema["type"] == "option":
-            return {"value": self._format_value(value, args)}
-        elif schema["type"] == "array":
+        if isinstance(value, str) and not TEMPLATE_MARKERS.search(value):
+            # Nothing to render. Jinja would still drop a single trailing newline though.
+            return value[:-1] if value.endswith("\n") else value
+        return self._compile_template(value).render(**args)
+
+    def translator(self, fieldid):
+        """Return the callable translating template values of fieldid to what Jira expects.
+
+        Translators are compiled from the field's schema on first use and kept until the metadata
+        is refreshed, so a field's type is only looked at once per service. Raises if the field
+        has a type that can't be translated.
+        """
+        translator = self._translators.get(fieldid)
+        if translator is None:
+            translator = self._compile_translator(fieldid, self.fields.schema(fieldid))
+            self._translators[fieldid] = translator
+        return translator
+
+    def _compile_translator(self, fieldid, schema):
+        if fieldid == "parent":
+            return lambda value, args: {"key": value}
+
+        if schema["type"] != "array":
+            return self._compile_scalar_translator(schema["type"], schema)
+
+        if schema.get("custom", "") == GH_SPRINT:
+            item = self._translate_sprint
+        else:
+            item = self._compile_scalar_translator(schema.get("items"), schema)
+        name = self.fields.names.get(fieldid, fieldid)
+
+        def translate_array(value, args):
             if not isinstance(value, MutableSequence):
                 raise Exception(
-                    f"Value for {self.fields_map.get(key, key)} must be a list, not a scalar: {value}"
-                )
-
-            return list(
-                map(
-                    lambda item: self._translate_type_value(
-                        key, {"type": schema["items"]}, item, args
-                    ),
-                    value,
+                    f"Value for {name} must be a list, not a scalar: {value}"
                 )
-            )
-        elif schema["type"] == "com.pyxis.greenhopper.jira:gh-sprint":
-            if isinstance(value, dict):
-                board = value["board"]
-                formatted = self._format_value(value["sprint"], args)
-            else:
-                board = None
-                formatted = self._format_value(value, args)
-
-            if isinstance(formatted, int):
-                return {"board": board, "sprint": formatted}
-            elif isinstance(formatted, str):
-                sprints = self.get_sprints(board)
-                for sprint in sprints:
-                    if sprint.name == formatted:
-                        return {"board": board, "id": sprint.id}
-                raise Exception(f"Could not find active/future sprint: {formatted}")
+            return [item(entry, args) for entry in value]
+
+        return translate_array
+
+    def _compile_scalar_translator(self, kind, schema):
+        format_value = self._format_value
+        if kind in ("string", "date", "datetime", "option2", "any"):
+            return format_value
+        elif kind == "number":
+            return lambda value, args: int(value)
+        elif kind in ("issuetype", "status", "priority", "component"):
+            return lambda value, args: {"name": format_value(value, args)}
+        elif kind == "project":
+            # As an object, a bare key makes the Jira client look up the project for every issue
+            return lambda value, args: {"key": format_value(value, args)}
+        elif kind == "user":
+            return lambda value, args: {"accountId": format_value(value, args)}
+        elif kind == "option":
+            return lambda value, args: {"value": format_value(value, args)}
+        elif kind == GH_SPRINT:
+            return self._translate_sprint
+        raise Exception("Unknown field type: " + str(schema))
+
+    def _translate_sprint(self, value, args):
+        if isinstance(value, dict):
+            board = value["board"]
+            formatted = self._format_value(value["sprint"], args)
         else:
-            raise Exception("Unknown field type: " + str(schema))
+            board = None
+            formatted = self._format_value(value, args)
+
+        if isinstance(formatted, int):
+            return {"board": board, "sprint": formatted}
+        elif isinstance(formatted, str):
+            sprints = self.get_sprints(board)
+            for sprint in sprints:
+                if sprint.name == formatted:
+                    return {"board": board, "id": sprint.id}
+            raise Exception(f"Could not find active/future sprint: {formatted}")
 
     def _translate_issue(self, issuemeta, args):
         fields = issuemeta["fields"]
         finalfields = {}
 
         for key, value in fields.items():
-            # field ids start lowercase, everything else is a custom field name
-            if not key[0].islower():
-                if key not in self.rev_fields_map:
-                    raise click.UsageError(f"'{key}' is not a valid field id or name")
-                key = self.rev_fields_map[key]
-
             try:
-                schema = self.full_fields_map[key].get("schema", {"type": "any"})
-                finalfields[key] = self._translate_type_value(
-                    key,
-                    schema,
-                    value,
-                    args,
-                )
+                key = self.fields.resolve(key)
+            except AmbiguousFieldError as e:
+                raise click.UsageError(str(e)) from e
             except KeyError as e:
-                raise Exception(
-                    f"Unknown field {e.args[0]} in '{fields.get('summary', '<unknown issue>')}'"
+                raise click.UsageError(
+                    f"'{key}' is not a valid field id or name"
                 ) from e
+
+            translate = self.translator(key)
+            try:
+                with self.profiler.span(self.fields.names.get(key, key), "render"):
+                    finalfields[key] = translate(value, args)
             except Exception as e:
                 raise Exception(
                     f"Error evaluating '{value}' in '{fields.get('summary', '<unknown issue>')}"
                 ) from e
 
         if "project" not in finalfields:
-            finalfields["project"] = self.defaultfield("project")
+            finalfields["project"] = {"key": self.defaultfield("project")}
 
         return finalfields
 
-    def process_issues(self, issues, args, parent=None, assignee=None, dry=False):
-        for issuemeta in issues:
+    def _plan_node(self, issuemeta, args, path, parent, assignee, key=None):
+        with self.profiler.span("translate", "issue", path=path):
             finalfields = self._translate_issue(issuemeta, args)
 
-            if parent:
-                finalfields["parent"] = {"key": parent}
+        if assignee:
+            finalfields["assignee"] = {"id": assignee}
+
+        if key:
+            finalfields["labels"] = list(finalfields.get("labels", [])) + [
+                instance_label(key),
+                node_label(key, path),
+            ]
+
+        sprints = []
+        sprintfield = self.fields.ids_by_name.get("Sprint", None)
+        if sprintfield and sprintfield in finalfields:
+            # Sprints are added after creation using a different api, unless the instance accepts
+            # the sprint id on the create screen. Only a single sprint can be set that way.
+            sprints = [
+                {**item, "name": self.get_sprint_dict(item["board"])[item["id"]].name}
+                for item in finalfields.pop(sprintfield)
+            ]
+            if sprints and self.toolconfig.get("inline_sprint", False):
+                finalfields[sprintfield] = sprints[0]["id"]
+                sprints[0]["inline"] = True
+
+        return PlanNode(
+            path,
+            finalfields,
+            sprints,
+            parent,
+            self._format_value(issuemeta["id"], args) if "id" in issuemeta else None,
+            self._plan_links(issuemeta.get("links", []), args),
+        )
 
-            if assignee:
-                finalfields["assignee"] = {"id": assignee}
+    def _plan_links(self, links, args):
+        planned = []
+        for link in links:
+            if (
+                not isinstance(link, dict)
+                or "type" not in link
+                or ("inward" in link) == ("outward" in link)
+            ):
+                raise Exception(
+                    f"Links need a type and either an inward or an outward id: {link}"
+                )
+            direction = "inward" if "inward" in link else "outward"
+            planned.append(
+                {
+                    "type": self._format_value(link["type"], args),
+                    direction: self._format_value(link[direction], args),
+                }
+            )
+        return planned
+
+    def plan_issues(
+        self, issues, args, parent=None, assignee=None, template=None, key=None
+    ):
+        """Render and validate all issues into a Plan, without writing anything to Jira.
+
+        With an idempotency key, the issues are labelled so a later apply of the same instance
+        skips those that already exist.
+        """
+        plan = Plan(self.jiraname, parent, template, args, key=key)
+        errors = []
+
+        with self.profiler.span("plan", "phase"):
+            for path, parentpath, issuemeta, issueargs in walk_issues(
+                issues, args, self.siblings
+            ):
+                try:
+                    plan.add(
+                        self._plan_node(
+                            issuemeta, issueargs, path, parentpath, assignee, key
+                        )
+                    )
+                except Exception as e:
+                    errors.append((path, e))
+
+        ids = {node.id for node in plan.nodes if node.id}
+        for node in plan.nodes:
+            for link in node.links:
+                target = link.get("inward", link.get("outward"))
+                if target not in ids:
+                    errors.append(
+                        (node.path, Exception(f"Link to unknown id '{target}'"))
+                    )
 
-            addsprints = []
-            sprintfield = self.rev_fields_map.get("Sprint", None)
-            if sprintfield and sprintfield in finalfields:
-                # We need to add the sprint using a different api
-                addsprints = finalfields[sprintfield]
-                del finalfields[sprintfield]
+        if len(errors) == 1:
+            raise errors[0][1]
+        elif errors:
+            raise Exception(
+                f"Failed to render {len(errors)} issues:\n\t"
+                + "\n\t".join(
+                    f"{path}: {e}"
+                    + (
+                        f": {e.__cause__}"
+                        if e.__cause__ and not isinstance(e, click.ClickException)
+                        else ""
+                    )
+                    for path, e in errors
+                )
+            )
 
-                def map_sprint(item):
-                    sprintdict = self.get_sprint_dict(item["board"])[item["id"]].name
-                    return sprintdict[item["id"]].name
+        return plan
+
+    def stream_plan(
+        self, issues, args, parent=None, assignee=None, template=None, key=None
+    ):
+        """Return a StreamingPlan, which renders each issue only right before it is created."""
+        return StreamingPlan(
+            self.jiraname,
+            parent,
+            template,
+            args,
+            issues,
+            self.siblings,
+            lambda issuemeta, issueargs, path, parentpath: self._plan_node(
+                issuemeta, issueargs, path, parentpath, assignee, key
+            ),
+            key,
+        )
 
-                sprintinfo = ",".join(map(map_sprint, addsprints))
+    def render_key(self, key, args):
+        """Render an idempotency key template like "release-{{ version }}" with args."""
+        key = self._format_value(key, args).strip()
+        if not key or '"' in key or any(char.isspace() for char in key):
+            raise click.UsageError(
+                f"Invalid idempotency key '{key}', it is used in labels and can't contain "
+                "spaces or quotes"
+            )
+        return key
+
+    def find_instance(self, key):
+        """Return the keys of the issues already created for idempotency key, by node path.
+
+        A single search for the instance label finds all of them, paginated by the Jira client,
+        however large the blueprint is.
+        """
+        with self.profiler.span("find instance", "metadata"):
+            issues = self.search_client.search_issues(
+                f'labels = "{instance_label(key)}" ORDER BY created ASC',
+                maxResults=False,
+                fields=["labels"],
+            )
 
-            issue = None
-            if dry:
-                if len(addsprints):
+        found = {}
+        for issue in issues:
+            for label in issue.fields.labels:
+                path = node_label_path(key, label)
+                if path:
+                    # Keep the oldest issue if an earlier run created duplicates
+                    found.setdefault(path, issue.key)
+        return found
+
+    def _add_to_sprints(self, sprints, dry=False):
+        with self.profiler.span("add to sprints", "phase"):
+            for (board, sprintid), issues in sprints.issues.items():
+                name = sprints.names[(board, sprintid)]
+                calls = -(-len(issues) // SPRINT_ADD_LIMIT)
+                if dry:
                     self.console.print(
-                        f"Would creating issue {finalfields['summary']} in {sprintinfo}"
+                        f"Would add {len(issues)} issues to sprint {name} in {calls} calls"
                     )
-                else:
-                    self.console.print(f"Would creating issue {finalfields['summary']}")
+                    self.console.indent()
+                    for issue in issues:
+                        self.console.print(issue)
+                    self.console.dedent()
+                    continue
+
+                self.console.print(f"Adding {len(issues)} issues to sprint {name}")
+                for start in range(0, len(issues), SPRINT_ADD_LIMIT):
+                    self.jira.add_issues_to_sprint(
+                        sprintid, issues[start : start + SPRINT_ADD_LIMIT]
+                    )
+
+    def _sprint_info(self, node):
+        return ",".join(sprint["name"] for sprint in node.sprints)
+
+    def _issue_fields(self, node, parent):
+        if not parent:
+            return node.fields
+        return {**node.fields, "parent": {"key": parent}}
+
+    def _link_type(self, name):
+        """Return the link type called name and whether its inward and outward issues are swapped.
+
+        Like the Jira client, the inward and outward descriptions (e.g. "is blocked by") are
+        accepted as well.
+        """
+        for linktype in self.link_types:
+            if name == linktype["name"] or name == linktype["outward"]:
+                return linktype["name"], False
+            elif name == linktype["inward"]:
+                return linktype["name"], True
+        raise Exception(f"Unknown issue link type '{name}'")
+
+    def rest(self, method, path, data):
+        """Send data to a Jira REST API endpoint with the client's session, returns the response.
+
+        Only for calls the Jira client makes more expensive than they are: create_issue_link()
+        fetches all link types again on every call and Issue.update() fetches the whole issue
+        after saving it. This is the one place that uses the client's internals, the session
+        still does the authentication, retries and rate limiting.
+        """
+        return self.jira._session.request(
+            method, self.jira._get_url(path), data=json.dumps(data)
+        )
+
+    def _create_links(self, run, jobs=1):
+        if not run.links:
+            return
+
+        with self.profiler.span("link issues", "phase"):
+            links = []
+            for linktype, inward, outward in run.links.resolve():
+                if inward in run.finished and outward in run.finished:
+                    # Both issues were found by the idempotency key, the run that created them
+                    # also linked them
+                    continue
+                name, swap = self._link_type(linktype)
+                links.append(
+                    (name, outward, inward) if swap else (name, inward, outward)
+                )
+            if not links:
+                return
+
+            if run.dry:
+                self.console.print(
+                    f"Would create {len(links)} issue links (inward -> outward)"
+                )
                 self.console.indent()
-                self.console.debug(json.dumps(finalfields, indent=2))
-                self.console.dedent()
-            else:
-                if len(addsprints):
+                for name, inward, outward in links:
                     self.console.print(
-                        f"Creating issue {finalfields['summary']} in {sprintinfo}...",
-                        end="",
+                        f"{run.links.summaries[inward]} ({inward}) -> "
+                        f"{run.links.summaries[outward]} ({outward}): {name}"
                     )
-                else:
-                    self.console.print(
-                        f"Creating issue {finalfields['summary']}...", end=""
+                self.console.dedent()
+                return
+
+            self.console.print(f"Creating {len(links)} issue links")
+
+            def create(link):
+                name, inward, outward = link
+                try:
+                    self.rest(
+                        "POST",
+                        "issueLink",
+                        {
+                            "type": {"name": name},
+                            "inwardIssue": {"key": run.created[inward]},
+                            "outwardIssue": {"key": run.created[outward]},
+                        },
                     )
-                issue = self.jira.create_issue(fields=finalfields)
-                self.console.print(" " + issue.permalink(), indent=False)
+                except Exception as e:
+                    return f"{inward} -> {outward} {name}: {e}"
+
+            # Links are independent of each other, create them in parallel but stop after the
+            # chunk in which something went wrong
+            errors = []
+            with ThreadPoolExecutor(max_workers=max(jobs, LINK_JOBS)) as pool:
+                for start in range(0, len(links), LINK_CHUNK_SIZE):
+                    chunk = links[start : start + LINK_CHUNK_SIZE]
+                    errors.extend(filter(None, pool.map(create, chunk)))
+                    if errors:
+                        break
+
+            if errors:
+                raise Exception(
+                    f"Failed to create {len(errors)} issue links:\n\t"
+                    + "\n\t".join(errors)
+                )
 
-                for sprint in addsprints:
-                    self.jira.add_issues_to_sprint(sprint["id"], [issue.key])
+    def _create_issue(self, node, parent, run, console):
+        run.links.add(node)
+        key = run.existing(node)
+        if key:
+            console.print(f"Skipping issue {node.summary}, already created as {key}")
+            run.add_existing_sprints(node, key)
+            return key
+
+        finalfields = self._issue_fields(node, parent)
+
+        if run.dry:
+            run.sprints.add(node.sprints, node.summary)
+            if node.sprints:
+                console.print(
+                    f"Would creating issue {node.summary} in {self._sprint_info(node)}"
+                )
+            else:
+                console.print(f"Would creating issue {node.summary}")
+            console.indent()
+            console.debug(json.dumps(finalfields, indent=2))
+            console.dedent()
+            return None
+
+        if node.sprints:
+            console.print(
+                f"Creating issue {node.summary} in {self._sprint_info(node)}...",
+                end="",
+            )
+        else:
+            console.print(f"Creating issue {node.summary}...", end="")
+        issue = self.jira.create_issue(fields=finalfields)
+        run.record((node.path, issue.key))
+        console.print(" " + issue.permalink(), indent=False)
+        run.sprints.add(node.sprints, issue.key)
+
+        return issue.key
+
+    def process_issues(
+        self,
+        issues,
+        args,
+        parent=None,
+        assignee=None,
+        dry=False,
+        bulk=False,
+        jobs=1,
+        key=None,
+    ):
+        with self.profiler.span("process issues", "phase"):
+            plan = self.plan_issues(
+                issues, args, parent=parent, assignee=assignee, key=key
+            )
+            return self.apply_plan(plan, dry=dry, bulk=bulk, jobs=jobs)
+
+    def apply_plan(self, plan, dry=False, bulk=False, jobs=1, journal=None):
+        """Create the issues in plan. With dry, only show what would be done.
+
+        Created issues are recorded in the journal if given, nodes already in it are skipped and
+        their recorded keys are used as parents for their children. The same goes for issues found
+        with the plan's idempotency key. Returns a dict of the issue keys by node path.
+        """
+        run = ApplyRun(dry, journal, self.find_instance(plan.key) if plan.key else None)
+        if run.found:
+            self.console.print(
+                f"Found {len(run.found)} issues already created for {plan.key}"
+            )
+        try:
+            with self.profiler.span("create issues", "phase"):
+                if bulk:
+                    self._apply_bulk(plan, run, jobs)
+                elif jobs > 1:
+                    self._apply_concurrent(plan, run, jobs)
+                else:
+                    self._apply_serial(plan, run)
+            self._create_links(run, jobs)
+        except Exception:
+            # Issues that were already created should still end up in their sprints
+            if not dry:
+                self._add_to_sprints(run.sprints)
+            raise
+
+        self._add_to_sprints(run.sprints, dry)
+        return run.created
+
+    def _apply_serial(self, plan, run):
+        # Depth first using a stack of (remaining siblings, parent key) instead of recursion, so
+        # deeply nested templates don't run into the recursion limit
+        stack = [(iter(plan.children()), plan.parent)]
+        try:
+            while stack:
+                siblings, parent = stack[-1]
+                node = next(siblings, None)
+                if node is None:
+                    stack.pop()
+                    if stack:
+                        self.console.dedent()
+                    continue
+
+                key = self._create_issue(node, parent, run, self.console)
+                children = plan.children(node)
+                plan.release(node)
+
+                # Children may be rendered lazily, so they are only known to be empty once
+                # iterated
+                self.console.indent()
+                stack.append((iter(children), key))
+        finally:
+            # Undo the indents of the levels still open if creating an issue failed
+            for _ in stack[1:]:
+                self.console.dedent()
+
+    def _apply_concurrent(self, plan, run, jobs):
+        # Sibling subtrees are independent, so every issue is submitted to the pool as soon as its
+        # parent's key is known. Each issue prints into its own buffer, which are kept in a tree
+        # and flushed once the whole top level subtree is done so output isn't interleaved.
+        pending = {}
+        roots = list(plan.children())
+        remaining = [0] * len(roots)
+        error = None
+
+        def submit(pool, node, parent, console, root):
+            output = (console, [])
+            future = pool.submit(self._create_issue, node, parent, run, console)
+            pending[future] = (node, output, root)
+            remaining[root] += 1
+            return output
+
+        def flush(output):
+            # Buffers flush into their parent's buffer, so children are flushed before their
+            # parent. Reversing the depth first order does that and keeps siblings in order.
+            order = []
+            stack = [output]
+            while stack:
+                console, children = stack.pop()
+                order.append(console)
+                stack.extend(children)
+            for console in reversed(order):
+                console.flush()
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            outputs = [
+                submit(pool, node, plan.parent, self.console.buffered(), root)
+                for root, node in enumerate(roots)
+            ]
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, (console, children), root = pending.pop(future)
+                    remaining[root] -= 1
+
+                    try:
+                        key = future.result()
+                    except Exception as e:
+                        error = error or e
+                    else:
+                        if not error:
+                            childnodes = plan.children(node)
+                            plan.release(node)
+                            for child in childnodes:
+                                childconsole = console.buffered()
+                                childconsole.indent()
+                                children.append(
+                                    submit(pool, child, key, childconsole, root)
+                                )
+
+                    if not remaining[root]:
+                        flush(outputs[root])
+
+        if error:
+            raise error
+
+    def _apply_bulk(self, plan, run, jobs):
+        # Breadth first: each level is a list of (node, parent key). All siblings on a level are
+        # submitted in chunks, the returned keys become the parents of the next level.
+        level = [(node, plan.parent) for node in plan.children()]
+        depth = 0
+
+        while level:
+            nextlevel = []
+
+            pending = []
+            for node, parent in level:
+                run.links.add(node)
+                key = run.existing(node)
+                if key:
+                    run.add_existing_sprints(node, key)
+                    nextlevel.extend((child, key) for child in plan.children(node))
+                    plan.release(node)
+                else:
+                    pending.append((node, parent))
 
-            if "children" in issuemeta:
+            if len(pending) < len(level):
+                self.console.print(
+                    f"Skipping {len(level) - len(pending)} issues at depth {depth} already created"
+                )
+            level = pending
+
+            if level:
+                self.console.print(
+                    f"{'Would create' if run.dry else 'Creating'} {len(level)} issues at depth {depth}"
+                )
                 self.console.indent()
-                self.process_issues(
-                    issuemeta["children"], args, issue.key if issue else None, dry
+                try:
+                    nextlevel.extend(self._apply_bulk_level(plan, run, jobs, level))
+                finally:
+                    self.console.dedent()
+
+            level = nextlevel
+            depth += 1
+
+    def _apply_bulk_level(self, plan, run, jobs, level):
+        chunks = [
+            level[start : start + BULK_CREATE_LIMIT]
+            for start in range(0, len(level), BULK_CREATE_LIMIT)
+        ]
+
+        def create_chunk(chunk):
+            if run.dry:
+                return [{"status": "Dry", "issue": None}] * len(chunk)
+            results = self.jira.create_issues(
+                [self._issue_fields(node, parent) for node, parent in chunk],
+                prefetch=False,
+            )
+            run.record(
+                *(
+                    (node.path, result["issue"].key)
+                    for (node, _), result in zip(chunk, results)
+                    if result["status"] != "Error"
                 )
-                self.console.dedent()
+            )
+            return results
+
+        if jobs > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                chunkresults = list(pool.map(create_chunk, chunks))
+        else:
+            chunkresults = map(create_chunk, chunks)
+
+        nextlevel = []
+        errors = []
+        for chunk, results in zip(chunks, chunkresults):
+            for (node, parent), result in zip(chunk, results):
+                if result["status"] == "Error":
+                    errors.append(f"{node.path} '{node.summary}': {result['error']}")
+                    continue
+
+                issue = result["issue"]
+                line = node.summary
+                if node.sprints:
+                    line += f" in {self._sprint_info(node)}"
+
+                if issue:
+                    self.console.print(f"{line} {issue.permalink()}")
+                    run.sprints.add(node.sprints, issue.key)
+                else:
+                    self.console.print(line)
+                    run.sprints.add(node.sprints, node.summary)
+                    self.console.indent()
+                    self.console.debug(
+                        json.dumps(self._issue_fields(node, parent), indent=2)
+                    )
+                    self.console.dedent()
+
+                nextlevel.extend(
+                    (child, issue.key if issue else None)
+                    for child in plan.children(node)
+                )
+                plan.release(node)
+
+        if errors:
+            raise Exception(
+                f"Bulk create failed for {len(errors)} issues:\n\t"
+                + "\n\t".join(errors)
+            )
+
+        return nextlevel
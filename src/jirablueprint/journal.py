@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+
+
+class JournalMismatchError(Exception):
+    pass
+
+
+class Journal:
+    """Write-ahead record of the issues created from a plan, for resuming interrupted runs.
+
+    The journal is a JSON lines file. The first line identifies the plan by service, template,
+    args and parent, every following line maps a plan node path to the key it was created as.
+    Each write is flushed and fsynced before the run continues.
+    """
+
+    def __init__(self, path, plan, resume=False):
+        self.path = path
+        self.created = {}
+        self._lock = threading.Lock()
+
+        header = {
+            "service": plan.service,
+            "template": plan.template,
+            "args": plan.args,
+            "parent": plan.parent,
+        }
+
+        if resume:
+            with open(path) as fd:
+                lines = fd.read().split("\n")
+
+            if json.loads(lines[0] or "{}") != header:
+                raise JournalMismatchError(
+                    f"Journal {path} was written for a different run: {lines[0]}"
+                )
+
+            for line in lines[1:]:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the run died while writing it
+                    continue
+                self.created[entry["path"]] = entry["key"]
+
+            self._fd = open(path, "a")
+            if lines[-1]:
+                self._fd.write("\n")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._fd = open(path, "w")
+            self._write([header])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, entries):
+        self._fd.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self._fd.flush()
+        os.fsync(self._fd.fileno())
+
+    def record(self, *created):
+        """Record one or more (path, key) pairs of created issues."""
+        with self._lock:
+            self._write([{"path": path, "key": key} for path, key in created])
+            self.created.update(created)
+
+    def close(self):
+        self._fd.close()
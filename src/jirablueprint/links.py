@@ -0,0 +1,52 @@
+import threading
+
+# Number of links created before checking for errors, and the minimum number of workers
+LINK_CHUNK_SIZE = 50
+LINK_JOBS = 4
+
+
+class IssueLinks:
+    """Links between the issues of a run, declared with template ids.
+
+    Nodes are added as they are created (or found to exist already), links are only resolved to
+    node paths once all issues of the run are known, so they can point anywhere in the template.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Template id => paths of the nodes with that id, more than one for issues in a loop
+        self.paths = {}
+        # (path, link type, "inward" or "outward", target id)
+        self.links = []
+        # Summaries of linked nodes, to show the links of dry runs
+        self.summaries = {}
+
+    def __len__(self):
+        return len(self.links)
+
+    def add(self, node):
+        if not node.id and not node.links:
+            return
+
+        with self._lock:
+            self.summaries[node.path] = node.summary
+            if node.id:
+                self.paths.setdefault(node.id, []).append(node.path)
+            for link in node.links:
+                direction = "inward" if "inward" in link else "outward"
+                self.links.append((node.path, link["type"], direction, link[direction]))
+
+    def resolve(self):
+        """Yield (link type, inward path, outward path) for every link.
+
+        A link to an id shared by several issues links to each of them. Raises for links to ids
+        that no issue in the run has.
+        """
+        for path, linktype, direction, target in self.links:
+            if target not in self.paths:
+                raise Exception(f"Issue {path} links to unknown id '{target}'")
+            for targetpath in self.paths[target]:
+                if direction == "inward":
+                    yield linktype, targetpath, path
+                else:
+                    yield linktype, path, targetpath
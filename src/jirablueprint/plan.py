@@ -0,0 +1,249 @@
+import json
+import threading
+
+from .links import IssueLinks
+from .sprints import SprintAssignments
+
+PLAN_VERSION = 1
+
+# Labels of issues created for a blueprint instance with an idempotency key. Every issue carries
+# the instance label, which is searched for, and a node label identifying its template position.
+INSTANCE_LABEL_PREFIX = "jirabp-"
+
+
+def instance_label(key):
+    return f"{INSTANCE_LABEL_PREFIX}{key}"
+
+
+def node_label(key, path):
+    return f"{instance_label(key)}@{path}"
+
+
+def node_label_path(key, label):
+    """Return the node path of a node label of instance key, or None for other labels."""
+    prefix = node_label(key, "")
+    return label[len(prefix) :] if label.startswith(prefix) else None
+
+
+def walk_issues(issues, args, siblings):
+    """Yield (path, parent path, issue, args) for each issue of a template, depth first in order.
+
+    siblings(issues, args, parentpath) yields (path, issue, args) for a list of sibling issues,
+    see JiraBlueprint.siblings. Uses an explicit stack of sibling iterators, so deeply nested
+    templates don't run into the recursion limit and loops are expanded one item at a time.
+    """
+    stack = [(None, iter(siblings(issues, args, None)))]
+    while stack:
+        parentpath, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        path, issue, issueargs = entry
+        yield path, parentpath, issue, issueargs
+
+        children = issue.get("children")
+        if children:
+            stack.append((path, iter(siblings(children, issueargs, path))))
+
+
+class PlanNode:
+    """A single rendered issue in a plan.
+
+    The path identifies the node in the template, e.g. "0.2" is the third child of the first top
+    level issue. Fields are ready to be sent to Jira except for the parent, which is only known
+    once the parent node has been created. Sprints are the translated sprint field values. The id
+    and links are the rendered template id and issue links, which are created after all issues.
+    """
+
+    def __init__(self, path, fields, sprints=None, parent=None, id=None, links=None):
+        self.path = path
+        self.fields = fields
+        self.sprints = sprints or []
+        self.parent = parent
+        self.id = id
+        self.links = links or []
+
+    @property
+    def summary(self):
+        return self.fields.get("summary", "<unknown issue>")
+
+    def release(self):
+        """Drop the rendered fields once the issue was submitted, only the summary is kept."""
+        self.fields = {"summary": self.summary}
+
+    def to_json(self):
+        return {
+            "path": self.path,
+            "parent": self.parent,
+            "fields": self.fields,
+            "sprints": self.sprints,
+            "id": self.id,
+            "links": self.links,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["path"],
+            data["fields"],
+            data["sprints"],
+            data["parent"],
+            data.get("id"),
+            data.get("links"),
+        )
+
+
+class Plan:
+    """The fully rendered issues of a template, in template order, without any writes to Jira."""
+
+    def __init__(
+        self, service, parent=None, template=None, args=None, nodes=None, key=None
+    ):
+        self.service = service
+        self.parent = parent
+        self.template = template
+        self.args = args or {}
+        # Idempotency key of the blueprint instance, see JiraBlueprint.find_instance
+        self.key = key
+        self.nodes = []
+        self._children = {}
+
+        for node in nodes or []:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        self.nodes.append(node)
+        self._children.setdefault(node.parent, []).append(node)
+
+    def children(self, node=None):
+        """Return the child nodes of node, or the top level nodes if node is None."""
+        return self._children.get(node.path if node else None, [])
+
+    def release(self, node):
+        """Called once node was submitted. A plan keeps all its nodes, so this does nothing."""
+
+    def to_json(self):
+        return {
+            "version": PLAN_VERSION,
+            "service": self.service,
+            "template": self.template,
+            "args": self.args,
+            "parent": self.parent,
+            "key": self.key,
+            "issues": [node.to_json() for node in self.nodes],
+        }
+
+    def dump(self, fd):
+        json.dump(self.to_json(), fd, indent=2)
+
+    @classmethod
+    def load(cls, fd):
+        return cls.from_json(json.load(fd))
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version {data.get('version')}")
+
+        return cls(
+            data["service"],
+            data["parent"],
+            data["template"],
+            data["args"],
+            [PlanNode.from_json(node) for node in data["issues"]],
+            data.get("key"),
+        )
+
+
+class StreamingPlan(Plan):
+    """A plan that renders the issues of a template only when they are about to be created.
+
+    children() renders the child issues of a node on demand, and release() drops their payload
+    once they were submitted, so only the issues between the top level and the current position
+    are kept in memory. Rendering errors are only found when the issue is reached, and the plan
+    can't be saved.
+    """
+
+    def __init__(
+        self, service, parent, template, args, issues, siblings, render, key=None
+    ):
+        super().__init__(service, parent, template, args, key=key)
+        self.issues = issues
+        self.siblings = siblings
+        self.render = render
+
+    def __len__(self):
+        return sum(1 for _ in walk_issues(self.issues, self.args, self.siblings))
+
+    def add(self, node):
+        raise TypeError("Issues of a streaming plan are rendered from the template")
+
+    def children(self, node=None):
+        """Render the child nodes of node one at a time, as they are iterated."""
+        if node is None:
+            issues, args, parentpath = self.issues, self.args, None
+        else:
+            (issues, args), parentpath = node.source, node.path
+
+        for path, issue, issueargs in self.siblings(issues, args, parentpath):
+            child = self.render(issue, issueargs, path, parentpath)
+            child.source = (issue.get("children", []), issueargs)
+            yield child
+
+    def release(self, node):
+        node.release()
+
+    def to_json(self):
+        raise TypeError(
+            "A streaming plan can't be saved, its issues are rendered on demand"
+        )
+
+
+class ApplyRun:
+    """State shared by the issues created in a single apply_plan call."""
+
+    def __init__(self, dry=False, journal=None, found=None):
+        self.dry = dry
+        self.journal = journal
+        # Keys of issues that already carry the plan's idempotency key, by node path
+        self.found = found or {}
+        # Sprint membership is collected for the whole run and added in batches at the end
+        self.sprints = SprintAssignments()
+        # Issue links are also collected and created once all issues exist
+        self.links = IssueLinks()
+        # Keys of all issues in the plan by node path, including those created in earlier runs
+        self.created = {}
+        # Paths of issues only found by the idempotency key. The run that created them finished,
+        # their sprints may have been changed since and must not be added again.
+        self.finished = set()
+        self._lock = threading.Lock()
+
+    def existing(self, node):
+        """Return the key node was created as in an earlier run, or None."""
+        key = self.journal.created.get(node.path) if self.journal else None
+        if key:
+            with self._lock:
+                self.created[node.path] = key
+        elif node.path in self.found:
+            key = self.found[node.path]
+            with self._lock:
+                self.created[node.path] = key
+                self.finished.add(node.path)
+        return key
+
+    def add_existing_sprints(self, node, key):
+        """Add an issue of an interrupted run to its sprints, which that run may not have done."""
+        if node.path not in self.finished:
+            self.sprints.add(node.sprints, key)
+
+    def record(self, *created):
+        """Record one or more (path, key) pairs of newly created issues."""
+        with self._lock:
+            self.created.update(created)
+        if self.journal:
+            self.journal.record(*created)
@@ -0,0 +1,176 @@
+import contextlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+# Path segments that identify a single resource, so calls can be grouped by endpoint
+ID_SEGMENT = re.compile(r"^(?:\d+|[A-Z][A-Z0-9_]*-\d+)$")
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def endpoint(method, url):
+    """Return e.g. "POST /rest/agile/1.0/sprint/{id}/issue" for a request."""
+    segments = urlparse(url).path.split("/")
+    for idx, segment in enumerate(segments):
+        # The number after /api/ is the API version, not a resource
+        if ID_SEGMENT.match(segment) and segments[idx - 1] != "api":
+            segments[idx] = "{id}"
+    return f"{method} {'/'.join(segments)}"
+
+
+def percentile(values, pct):
+    """Nearest rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    rank = min(len(values), max(1, math.ceil(pct / 100 * len(values))))
+    return values[rank - 1]
+
+
+class Span:
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(
+            self.name,
+            self.category,
+            self.start,
+            time.perf_counter() - self.start,
+            **self.args,
+        )
+
+
+class Profiler:
+    """Collects timed spans of a run, to report where the time went.
+
+    Spans have a category: "phase" for the steps of a command, "metadata" for fetching (or reading
+    cached) metadata, "render" for rendering a single field, "issue" for translating an issue, and
+    "http" for each call to Jira including its retries. When disabled, span() returns a shared no-op
+    context manager, so instrumentation can stay in place.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def span(self, name, category, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, args)
+
+    def record(self, name, category, start, duration, **args):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans.append(
+                (name, category, start, duration, threading.get_ident(), args)
+            )
+
+    def _grouped(self, category):
+        groups = {}
+        for name, spancategory, _, duration, _, args in self.spans:
+            if spancategory == category:
+                groups.setdefault(name, []).append((duration, args))
+        return groups
+
+    def report(self):
+        """Return the breakdown of the recorded spans by category, durations in seconds."""
+        report = {"total": time.perf_counter() - self.started}
+
+        for category in ("phase", "metadata", "issue", "render"):
+            report[category] = {
+                name: {
+                    "count": len(entries),
+                    "total": sum(duration for duration, _ in entries),
+                    "max": max(duration for duration, _ in entries),
+                }
+                for name, entries in self._grouped(category).items()
+            }
+
+        report["http"] = {}
+        for name, entries in sorted(self._grouped("http").items()):
+            durations = sorted(duration for duration, _ in entries)
+            report["http"][name] = {
+                "count": len(entries),
+                "total": sum(durations),
+                "p50": percentile(durations, 50),
+                "p90": percentile(durations, 90),
+                "p99": percentile(durations, 99),
+                "max": durations[-1],
+                "retries": sum(args.get("retries", 0) for _, args in entries),
+                "errors": sum(1 for _, args in entries if args.get("status", 0) >= 400),
+            }
+
+        return report
+
+    def format_table(self):
+        report = self.report()
+        lines = [f"Total {report['total'] * 1000:.1f} ms", ""]
+
+        titles = {
+            "phase": "Phase",
+            "metadata": "Metadata",
+            "issue": "Issues",
+            "render": "Render by field",
+        }
+        for category, title in titles.items():
+            if not report[category]:
+                continue
+            lines.append(f"{title:50} {'count':>7} {'total ms':>10} {'max ms':>10}")
+            for name, entry in sorted(
+                report[category].items(), key=lambda item: -item[1]["total"]
+            ):
+                lines.append(
+                    f"  {name[:48]:48} {entry['count']:7} "
+                    f"{entry['total'] * 1000:10.1f} {entry['max'] * 1000:10.1f}"
+                )
+            lines.append("")
+
+        if report["http"]:
+            lines.append(
+                f"{'HTTP calls':50} {'count':>7} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10}"
+                f" {'max ms':>10} {'retries':>8} {'errors':>7}"
+            )
+            for name, entry in report["http"].items():
+                lines.append(
+                    f"  {name[:48]:48} {entry['count']:7} {entry['p50'] * 1000:10.1f} "
+                    f"{entry['p90'] * 1000:10.1f} {entry['p99'] * 1000:10.1f} "
+                    f"{entry['max'] * 1000:10.1f} {entry['retries']:8} {entry['errors']:7}"
+                )
+
+        return "\n".join(lines).rstrip() + "\n"
+
+    def format_json(self):
+        return json.dumps(self.report(), indent=2) + "\n"
+
+    def dump_trace(self, fd):
+        """Write the spans in Chrome trace event format, which speedscope and Perfetto can load."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.started) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            for name, category, start, duration, tid, args in self.spans
+        ]
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fd)
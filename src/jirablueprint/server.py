@@ -0,0 +1,325 @@
+import contextlib
+import io
+import ipaddress
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import click
+
+from .cli import (
+    apply_journaled,
+    check_required_args,
+    instance_key,
+    resolve_assignee,
+    run_reporting_errors,
+    template_catalog,
+)
+from .client import parse_address
+from .plan import Plan
+
+
+def is_loopback(host):
+    """Whether every address host resolves to is a loopback address."""
+    try:
+        addresses = socket.getaddrinfo(host.strip("[]"), None)
+    except socket.gaierror:
+        return False
+    return all(
+        ipaddress.ip_address(address[4][0].split("%")[0]).is_loopback
+        for address in addresses
+    )
+
+
+DEFAULT_SERVER = {
+    "listen": None,
+    "refresh": 15 * 60,
+    "queue": 16,
+}
+
+
+class Job:
+    """A request handled by the server's worker, capturing its console output."""
+
+    def __init__(self, func):
+        self.func = func
+        self.done = threading.Event()
+        self.status = 200
+        self.result = None
+        self.error = None
+        self.output = ""
+
+    def run(self):
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                self.result = self.func()
+        except click.UsageError as e:
+            self.status = 400
+            self.error = e.format_message()
+        except click.ClickException as e:
+            self.status = 500
+            self.error = e.format_message()
+        except Exception as e:
+            self.status = 500
+            self.error = f"{e.__class__.__name__}: {e}"
+        finally:
+            self.output = output.getvalue()
+            self.done.set()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "jirablueprint"
+
+    # (method, path) => (handler name, whether the request goes through the queue)
+    ROUTES = {
+        ("GET", "/status"): ("status", False),
+        ("GET", "/templates"): ("list_templates", True),
+        ("POST", "/plan"): ("plan", True),
+        ("POST", "/apply"): ("apply", True),
+        ("POST", "/fromtemplate"): ("fromtemplate", True),
+    }
+
+    def address_string(self):
+        # Unix socket clients don't have an address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        if self.server.app.blueprint.debug:
+            super().log_message(format, *args)
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        route = self.ROUTES.get((method, url.path))
+        if not route:
+            self._respond(404, {"error": f"No such endpoint {method} {url.path}"})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if method == "POST":
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                params.update(json.loads(self.rfile.read(length) or "{}"))
+            except ValueError as e:
+                self._respond(400, {"error": f"Invalid request body: {e}"})
+                return
+
+        app = self.server.app
+        name, queued = route
+        job = Job(partial(getattr(app, name), params))
+        if queued:
+            try:
+                app.queue.put_nowait(job)
+            except queue.Full:
+                self._respond(
+                    503, {"error": "Too many queued requests, try again later"}
+                )
+                return
+            job.done.wait()
+        else:
+            # Output is only captured for queued requests, those handlers don't print
+            job.result = job.func()
+
+        self._respond(
+            job.status, {"result": job.result, "output": job.output, "error": job.error}
+        )
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+
+class BlueprintServer:
+    """Keeps a JiraBlueprint instance warm and serves template listing, plan and apply.
+
+    Requests are queued and handled one at a time by a single worker, so issues are created in the
+    order requests arrive and the metadata caches and connection pool are shared without locking.
+    The same worker refreshes the cached metadata periodically in between requests.
+    """
+
+    def __init__(self, blueprint, templates=None, refresh=None, queuesize=None):
+        self.blueprint = blueprint
+        self.templates = templates
+        self.refresh = DEFAULT_SERVER["refresh"] if refresh is None else refresh
+        self.queue = queue.Queue(queuesize or DEFAULT_SERVER["queue"])
+        self.started = time.time()
+        self.refreshed = None
+        self.handled = 0
+        self._stopped = threading.Event()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            job.run()
+            self.handled += 1
+
+    def _run_maintenance(self, func):
+        job = Job(func)
+        self.queue.put(job)
+        job.done.wait()
+        if job.error:
+            # sys.stderr may be redirected by the job the worker is running right now
+            print(f"Could not refresh metadata: {job.error}", file=sys.__stderr__)
+
+    def _maintain(self):
+        self._run_maintenance(self._warm)
+        while self.refresh and not self._stopped.wait(self.refresh):
+            self._run_maintenance(self._refresh)
+
+    def _refresh(self):
+        self.blueprint.refresh_metadata()
+        self.refreshed = time.time()
+
+    def _warm(self):
+        blueprint = self.blueprint
+        blueprint.fields
+        if blueprint.defaultfield("board"):
+            blueprint.get_sprints()
+        self.refreshed = time.time()
+
+    def _listen(self, address):
+        target = parse_address(address)
+        if isinstance(target, tuple):
+            # Requests aren't authenticated and act with the stored Jira credentials
+            if not is_loopback(target[0]):
+                raise click.UsageError(
+                    f"Refusing to listen on {target[0]}, the server has no authentication. "
+                    "Use a Unix socket or a loopback address like localhost"
+                )
+            return ThreadingHTTPServer(target, RequestHandler)
+
+        if os.path.exists(target):
+            # Only remove the socket if nobody is listening on it anymore
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(target)
+                except OSError:
+                    os.unlink(target)
+                else:
+                    raise click.ClickException(
+                        f"Another server is already listening on {target}"
+                    )
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # The socket gives access to the Jira credentials, only allow the current user
+        umask = os.umask(0o177)
+        try:
+            return UnixHTTPServer(target, RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def serve(self, address):
+        httpd = self._listen(address)
+        httpd.app = self
+        click.echo(f"Serving {self.blueprint.jiraname} on {address}")
+
+        threading.Thread(target=self._work, daemon=True).start()
+        threading.Thread(target=self._maintain, daemon=True).start()
+        # Clean up the socket when stopped by a service manager as well
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stopped.set()
+            httpd.server_close()
+            if isinstance(httpd, UnixHTTPServer):
+                os.unlink(httpd.server_address)
+
+    # The handlers below are called with the request's query and body parameters
+
+    def status(self, params):
+        return {
+            "service": self.blueprint.jiraname,
+            "uptime": time.time() - self.started,
+            "refreshed": self.refreshed,
+            "handled": self.handled,
+            "queued": self.queue.qsize(),
+        }
+
+    def list_templates(self, params):
+        catalog = template_catalog(self.blueprint, params.get("file") or self.templates)
+        return [{"name": name, "args": args} for name, args in catalog.templates()]
+
+    def _check_service(self, params):
+        if params.get("service") != self.blueprint.jiraname:
+            raise click.UsageError(
+                f"The server runs on the {self.blueprint.jiraname} service, not "
+                f"{params.get('service')}"
+            )
+
+    def plan(self, params):
+        self._check_service(params)
+        catalog = template_catalog(self.blueprint, params.get("file") or self.templates)
+        name = params.get("template")
+        if name not in catalog:
+            raise click.BadArgumentUsage(
+                f"Could not find template {name} in {catalog.path}"
+            )
+
+        template = catalog.load(name)
+        args = params.get("args", {})
+        check_required_args(template, args)
+
+        plan = run_reporting_errors(
+            self.blueprint,
+            self.blueprint.plan_issues,
+            template["issues"],
+            args,
+            parent=params.get("parent"),
+            assignee=resolve_assignee(self.blueprint, params.get("assignee")),
+            template=name,
+            key=instance_key(self.blueprint, template, params.get("key"), args),
+        )
+        return plan.to_json()
+
+    def apply(self, params):
+        self._check_service(params)
+        try:
+            plan = Plan.from_json(params["plan"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise click.UsageError(f"Invalid plan: {e}") from e
+
+        if plan.service != self.blueprint.jiraname:
+            raise click.UsageError(
+                f"Plan was made for the {plan.service} service, not {self.blueprint.jiraname}"
+            )
+
+        return apply_journaled(
+            self.blueprint,
+            plan,
+            None,
+            None,
+            dry=params.get("dry", False),
+            bulk=params.get("bulk", False),
+            jobs=params.get("jobs", 1),
+        )
+
+    def fromtemplate(self, params):
+        return self.apply({**params, "plan": self.plan(params)})
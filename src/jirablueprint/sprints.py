@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+# Maximum number of issues the agile API accepts when moving issues to a sprint
+SPRINT_ADD_LIMIT = 50
+
+
+def parse_sprint_date(datestr):
+    return datetime.strptime(datestr, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class CachedSprint:
+    """A sprint read from the metadata cache, exposing its raw fields as attributes.
+
+    This mirrors the attribute access of jira's Sprint resource without needing a client.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["raw"][name]
+        except KeyError:
+            raise AttributeError(
+                f"{self.__class__.__name__!r} object has no attribute {name!r}"
+            ) from None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.raw.get('name')!r}>"
+
+
+class SprintIndex:
+    """The active and future sprints of a board, sorted by start date.
+
+    Dates are parsed once when building the index. Looking up the sprint for a date is a binary
+    search, and moving a number of sprints forward or backward is a position offset.
+    """
+
+    def __init__(self, sprints):
+        self.by_name = {sprint.name: sprint for sprint in sprints}
+        self.active = next(
+            (sprint for sprint in sprints if sprint.state == "active"), None
+        )
+
+        dated = sorted(
+            (
+                (
+                    parse_sprint_date(sprint.startDate),
+                    parse_sprint_date(sprint.endDate),
+                    sprint,
+                )
+                for sprint in sprints
+                if sprint.startDate and sprint.endDate
+            ),
+            key=lambda entry: entry[0],
+        )
+
+        self._starts = [start for start, _, _ in dated]
+        self._sprints = [sprint for _, _, sprint in dated]
+        self._positions = {sprint.name: idx for idx, sprint in enumerate(self._sprints)}
+
+        # Running maximum of the end dates, so overlapping sprints can be bisected as well
+        self._max_ends = []
+        for _, end, _ in dated:
+            self._max_ends.append(
+                max(end, self._max_ends[-1]) if self._max_ends else end
+            )
+
+    def __len__(self):
+        return len(self._sprints)
+
+    def find_by_date(self, target):
+        """Return the earliest starting sprint that contains target, or None."""
+        last = bisect_right(self._starts, target) - 1
+        first = bisect_left(self._max_ends, target)
+        return self._sprints[first] if first <= last else None
+
+    def relative(self, name, offset):
+        """Return the sprint offset sprints after (or before, if negative) name, or None."""
+        position = self._positions.get(name)
+        if position is None:
+            return None
+
+        position += offset
+        return self._sprints[position] if 0 <= position < len(self._sprints) else None
+
+
+class SprintAssignments:
+    """Sprint membership of the issues created in a run, to be added in one call per sprint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.issues = {}
+        self.names = {}
+
+    def __len__(self):
+        return len(self.issues)
+
+    def add(self, sprints, issue):
+        """Record issue (a key, or a summary in dry runs) for each of the planned sprints."""
+        with self._lock:
+            for sprint in sprints:
+                # Sprints set inline in the create payload don't need to be added anymore
+                if sprint.get("inline", False):
+                    continue
+                key = (sprint["board"], sprint["id"])
+                self.names[key] = sprint["name"]
+                self.issues.setdefault(key, []).append(issue)
@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .export import search_pages
+from .plan import instance_label, node_label_path
+
+# Fields that are never synced, changing them takes moving the issue rather than editing it
+UNSYNCED_FIELDS = ("project", "issuetype")
+
+# Number of updates sent before checking for errors, and the minimum number of workers
+SYNC_CHUNK_SIZE = 50
+SYNC_JOBS = 4
+
+
+def same_value(wanted, current):
+    """Whether the value Jira returned for a field already matches the translated template value.
+
+    Jira returns objects with more properties than creating an issue takes, e.g. a priority has an
+    id and icon besides its name, so only the properties the template sets are compared. Lists are
+    compared regardless of their order.
+    """
+    if wanted in (None, "", []) or current in (None, "", []):
+        return wanted in (None, "", []) and current in (None, "", [])
+    elif isinstance(wanted, dict):
+        return isinstance(current, dict) and all(
+            name in current and same_value(value, current[name])
+            for name, value in wanted.items()
+        )
+    elif isinstance(wanted, list):
+        if not isinstance(current, list) or len(wanted) != len(current):
+            return False
+        remaining = list(current)
+        for item in wanted:
+            for idx, candidate in enumerate(remaining):
+                if same_value(item, candidate):
+                    del remaining[idx]
+                    break
+            else:
+                return False
+        return True
+    elif isinstance(wanted, str) and isinstance(current, str):
+        # Jira normalizes line endings and drops trailing whitespace of text fields
+        return (
+            wanted.replace("\r\n", "\n").rstrip()
+            == current.replace("\r\n", "\n").rstrip()
+        )
+    return wanted == current
+
+
+class InstanceSync:
+    """Brings the issues of a blueprint instance in line with the current template.
+
+    The issues created for an idempotency key are found by their instance label in one paginated
+    search, fetching only the fields the template sets. Each issue is compared field by field with
+    its rendered plan node and only the changed fields of changed issues are sent to Jira.
+    """
+
+    def __init__(self, blueprint, key):
+        self.blueprint = blueprint
+        self.key = key
+
+    def fetch(self, fieldids):
+        """Return the raw issues of the instance by node path."""
+        issues = {}
+        with self.blueprint.profiler.span("find instance", "metadata"):
+            for raw in search_pages(
+                self.blueprint.search_client,
+                f'labels = "{instance_label(self.key)}" ORDER BY created ASC',
+                fieldids,
+            ):
+                for label in raw["fields"].get("labels") or []:
+                    path = node_label_path(self.key, label)
+                    if path:
+                        # Keep the oldest issue if an earlier run created duplicates
+                        issues.setdefault(path, raw)
+        return issues
+
+    def diff(self, plan):
+        """Compare plan with the existing issues.
+
+        Returns the changes as (node, issue key, changed fields) tuples, the nodes that have no
+        issue yet and the keys of issues that are no longer in the template.
+        """
+        # Sprints are left alone as well, with inline_sprint the sprint id stays in the fields
+        unsynced = set(UNSYNCED_FIELDS)
+        sprintfield = self.blueprint.fields.ids_by_name.get("Sprint")
+        if sprintfield:
+            unsynced.add(sprintfield)
+
+        fieldids = sorted(
+            {fieldid for node in plan.nodes for fieldid in node.fields} - unsynced
+        )
+        issues = self.fetch(fieldids)
+
+        changes = []
+        missing = []
+        for node in plan.nodes:
+            raw = issues.pop(node.path, None)
+            if not raw:
+                missing.append(node)
+                continue
+
+            changed = {
+                fieldid: value
+                for fieldid, value in node.fields.items()
+                if fieldid not in unsynced
+                and not same_value(value, raw["fields"].get(fieldid))
+            }
+            if changed:
+                changes.append((node, raw["key"], changed))
+
+        return changes, missing, [raw["key"] for raw in issues.values()]
+
+    def sync(self, plan, dry=False, jobs=1):
+        """Update the issues that differ from plan, returns the number of updated issues."""
+        console = self.blueprint.console
+        names = self.blueprint.fields.names
+
+        changes, missing, orphaned = self.diff(plan)
+
+        for node, key, changed in changes:
+            fieldnames = ", ".join(names.get(fieldid, fieldid) for fieldid in changed)
+            console.print(
+                f"{'Would update' if dry else 'Updating'} {key} {node.summary}: {fieldnames}"
+            )
+
+        if not dry and changes:
+
+            def update(change):
+                node, key, changed = change
+                try:
+                    self.blueprint.rest("PUT", f"issue/{key}", {"fields": changed})
+                except Exception as e:
+                    return f"{key} {node.summary}: {e}"
+
+            # Updates are independent of each other, send them in parallel but stop after the
+            # chunk in which something went wrong
+            errors = []
+            with self.blueprint.profiler.span("sync issues", "phase"):
+                with ThreadPoolExecutor(max_workers=max(jobs, SYNC_JOBS)) as pool:
+                    for start in range(0, len(changes), SYNC_CHUNK_SIZE):
+                        chunk = changes[start : start + SYNC_CHUNK_SIZE]
+                        errors.extend(filter(None, pool.map(update, chunk)))
+                        if errors:
+                            break
+
+            if errors:
+                raise Exception(
+                    f"Failed to update {len(errors)} issues:\n\t" + "\n\t".join(errors)
+                )
+
+        uptodate = len(plan) - len(changes) - len(missing)
+        console.print(
+            f"{len(changes)} issues {'to update' if dry else 'updated'}, {uptodate} up to date"
+        )
+        if missing:
+            console.print(
+                f"{len(missing)} issues of the template don't exist in {self.key} yet, create "
+                f"them with fromtemplate --key {self.key}"
+            )
+        if orphaned:
+            console.print(
+                f"{len(orphaned)} issues of {self.key} are no longer in the template: "
+                + " ".join(orphaned)
+            )
+        return len(changes)
@@ -0,0 +1,277 @@
+import logging
+import random
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from .profiling import endpoint
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TRANSPORT = {
+    "pool_size": 10,
+    "keepalive": True,
+    "timeout": None,
+    "retries": 5,
+    "backoff": 1.0,
+    "max_backoff": 60.0,
+    "rate": None,
+    "burst": 10,
+}
+
+RETRY_STATUS = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds for a Retry-After header, which can be seconds or a date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0,
+            (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(),
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value):
+    """Return the seconds until an X-RateLimit-Reset timestamp, or None."""
+    if not value:
+        return None
+    try:
+        reset = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset.tzinfo is None:
+        reset = reset.replace(tzinfo=timezone.utc)
+    return max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Token bucket limiting the request rate, adapting to the responses from the server.
+
+    Without a configured maximum, requests are not limited until the server throttles us or
+    reports that we are near its limit, starting from the rate we were sending at. The rate is
+    halved when the server throttles us and asks to wait, follows the remaining budget if the
+    server reports one, and otherwise recovers towards the configured rate, or back to not limiting
+    the requests if there is none.
+    """
+
+    def __init__(self, rate=None, burst=10, min_rate=0.5):
+        self.max_rate = rate
+        # None while requests are not limited
+        self.rate = rate
+        self.min_rate = min(min_rate, rate) if rate else min_rate
+        self.burst = burst
+        self.tokens = burst
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        # Start times of the requests sent in the last second, while not limited
+        self._sent = deque()
+        self._slowed = 0.0
+        # Rate at which we were throttled after sending without a limit
+        self._recovered = None
+        self._lock = threading.Lock()
+
+    def _sending_rate(self, now):
+        while self._sent and self._sent[0] < now - 1:
+            self._sent.popleft()
+        return len(self._sent)
+
+    def _limit(self, rate):
+        # Called with the lock held
+        if self.rate is None:
+            self.tokens = 0
+            self._updated = time.monotonic()
+        self.rate = max(self.min_rate, rate)
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.rate is None:
+                self._sent.append(now)
+                self._sending_rate(now)
+                delay = max(self.paused_until - now, 0)
+            else:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                # Reserve a token, possibly going into debt, and wait for it outside the lock
+                self.tokens -= 1
+                delay = max(-self.tokens / self.rate, self.paused_until - now, 0)
+
+        if delay:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, response):
+        headers = response.headers
+        with self._lock:
+            current = self.rate or self._sending_rate(time.monotonic())
+            if response.status_code in RETRY_STATUS:
+                # A Retry-After of 0 asks for an immediate retry, the throttling is sporadic rather
+                # than a sign that we send too fast
+                if parse_retry_after(headers.get("Retry-After")) == 0:
+                    return
+                # Concurrent requests are often throttled together, slow down once for all of them
+                now = time.monotonic()
+                if now - self._slowed >= 1:
+                    self._slowed = now
+                    if self.rate is None:
+                        self._recovered = current
+                    self._limit(current / 2)
+                return
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = parse_reset(headers.get("X-RateLimit-Reset"))
+            if remaining is not None and reset:
+                try:
+                    budget = float(remaining) / reset
+                except ValueError:
+                    budget = None
+                if budget is not None:
+                    self._limit(min(self.max_rate or budget, budget))
+                    return
+
+            if headers.get("X-RateLimit-NearLimit", "").lower() == "true":
+                self._limit(current * 0.8)
+            elif self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+            elif self.rate is not None:
+                # Go back to not limiting the requests once we are at the rate we were throttled at
+                self.rate *= 1.1
+                if self._recovered is not None and self.rate >= self._recovered:
+                    self.rate = None
+                    self._recovered = None
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTP adapter with a connection pool, rate limiting and retries for throttled requests.
+
+    429 and 503 responses are retried for all methods, since the server did not process the
+    request. The Retry-After header is honored, otherwise the delay is an exponential backoff with
+    full jitter. Connection errors are only retried for idempotent methods.
+    """
+
+    def __init__(self, config, limiter=None, profiler=None):
+        # HTTPAdapter already uses self.config for something else
+        self.transport = config
+        self.limiter = limiter
+        self.profiler = profiler
+        super().__init__(
+            pool_connections=config["pool_size"],
+            pool_maxsize=config["pool_size"],
+            pool_block=True,
+            max_retries=0,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.transport["keepalive"]:
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+    def _backoff(self, attempt):
+        delay = min(
+            self.transport["max_backoff"], self.transport["backoff"] * 2**attempt
+        )
+        return random.uniform(0, delay)
+
+    def _record(self, request, start, retries, status):
+        if self.profiler:
+            self.profiler.record(
+                endpoint(request.method, request.url),
+                "http",
+                start,
+                time.perf_counter() - start,
+                status=status,
+                retries=retries,
+            )
+
+    def send(self, request, **kwargs):
+        if not self.transport["keepalive"]:
+            request.headers["Connection"] = "close"
+
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire()
+
+            try:
+                response = super().send(request, **kwargs)
+            except requests.ConnectionError:
+                if (
+                    request.method not in IDEMPOTENT_METHODS
+                    or attempt >= self.transport["retries"]
+                ):
+                    self._record(request, start, attempt, 0)
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if self.limiter:
+                    self.limiter.observe(response)
+
+                if (
+                    response.status_code not in RETRY_STATUS
+                    or attempt >= self.transport["retries"]
+                ):
+                    self._record(request, start, attempt, response.status_code)
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is None:
+                    delay = self._backoff(attempt)
+                else:
+                    wait = min(self.transport["max_backoff"], retry_after)
+                    # Hold back all requests for the time the server asked for, and add some
+                    # jitter to this one so parallel requests don't all come back at once
+                    if self.limiter and wait > 0:
+                        self.limiter.pause(wait)
+                    delay = wait + random.uniform(0, self.transport["backoff"])
+                response.close()
+
+            attempt += 1
+            log.debug(
+                "Retrying %s %s in %.1fs [%d/%d]",
+                request.method,
+                request.url,
+                delay,
+                attempt,
+                self.transport["retries"],
+            )
+            time.sleep(delay)
+
+
+def transport_config(serviceconfig):
+    return {**DEFAULT_TRANSPORT, **serviceconfig.get("transport", {})}
+
+
+def configure_session(session, config, profiler=None):
+    """Mount a ThrottledAdapter with the given transport config on the session."""
+    limiter = (
+        RateLimiter(config["rate"], config["burst"]) if config["rate"] != 0 else None
+    )
+    adapter = ThrottledAdapter(config, limiter, profiler)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
@@ -1,3 +1,5 @@
+import csv
+import json
 import textwrap
 
 from ruamel.yaml import YAML
@@ -19,6 +21,11 @@ yaml = StringYAML(typ="rt")
 yaml.preserve_quotes = True
 yaml.default_flow_style = False
 
+# Round trip loading keeps comments and formatting, which is only needed for YAML that is dumped
+# again for editing. Everything else uses the much faster safe loader, which is backed by libyaml
+# when ruamel.yaml.clib is installed.
+fast_yaml = YAML(typ="safe")
+
 
 def compile_issue_template(issuetypemeta, issuetype, project, pinned):
     template = f"{issuetype.lower()}:\n"
@@ -72,10 +79,52 @@ def sort_pinned(pinned, entry):
         return 3 + len(pinned)
 
 
+def read_args_file(fd, name):
+    """Yield a dict of template args per row of a CSV or JSON lines file, one row at a time."""
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        for lineno, line in enumerate(fd, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {lineno} of {name} is not a JSON object")
+            yield {key: value for key, value in row.items() if value is not None}
+    else:
+        for row in csv.DictReader(fd):
+            # Empty cells are treated as not supplied, so optional args keep their defaults
+            yield {key: value for key, value in row.items() if key and value != ""}
+
+
 class ConsolePrinter:
-    def __init__(self, debug):
+    def __init__(self, debug, buffer=None, parent=None):
         self._debug = debug
         self._indent = 0
+        self._buffer = buffer
+        self._parent = parent
+
+    def buffered(self):
+        """Create a printer at the current indent that collects output until flush() is called.
+
+        Flushed output goes to this printer, so it ends up in this printer's buffer if it has one.
+        """
+        printer = ConsolePrinter(self._debug, [], self)
+        printer._indent = self._indent
+        return printer
+
+    def flush(self):
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            if self._parent:
+                self._parent._write(text, "")
+            else:
+                print(text, end="")
+
+    def _write(self, text, end):
+        if self._buffer is None:
+            print(text, end=end)
+        else:
+            self._buffer.append(text + end)
 
     def indent(self):
         self._indent += 1
@@ -84,14 +133,17 @@ class ConsolePrinter:
         self._indent -= 1
 
     def printlines(self, text):
-        print(textwrap.indent(text, "\t" * self._indent))
+        self._write(textwrap.indent(text, "\t" * self._indent), "\n")
 
     def print(self, *args, end="\n", indent=True):
-        if indent:
-            data = " ".join(args)
-            print(textwrap.indent(data, "\t" * self._indent), end=end)
-        else:
-            print(*args, end=end)
+        data = " ".join(args)
+        if indent and self._indent:
+            if "\n" in data:
+                data = textwrap.indent(data, "\t" * self._indent)
+            elif data.strip():
+                # Single lines are by far the most common, skip textwrap's line splitting
+                data = "\t" * self._indent + data
+        self._write(data, end)
 
     def debug(self, *args, end="\n", indent=True):
         if self._debug: